@@ -0,0 +1,53 @@
+from argparse import ArgumentParser
+import os
+import sys
+import json
+import time
+import subprocess
+from statistics import mean
+
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Code run in a fresh interpreter for each of the entry points, together
+# with the heavy modules that must never be loaded by that entry point
+BENCHMARKS = {
+    'cli'     : ('import parse; parse.get_parser()', ('abjad', 'cv2', 'PIL')),
+    'extract' : ('import parse; from parser import extract_notes, dump_music', ('abjad',)),
+    'render'  : ('import parse; from parser import fix_invalid, load_music, run_sweep; import abjad', ('cv2', 'PIL')),
+    'full'    : ('import parse; from parser import extract_notes, fix_invalid; import abjad', ()),
+}
+
+def cold_start(code : str, forbidden : List[str]) -> float:
+    '''Time (in seconds) of a cold interpreter start running the given code.
+    Fails if any of the forbidden modules gets imported along the way.
+    '''
+    check = f'import sys; leaked = [m for m in {list(forbidden)!r} if m in sys.modules]; assert not leaked, leaked'
+    
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', f'{code}; {check}'], cwd=ROOT, check=True)
+    return time.perf_counter() - start
+
+def main(repeat : int, out : str | None) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for name, (code, forbidden) in BENCHMARKS.items():
+        times = [cold_start(code, forbidden) for _ in range(repeat)]
+        results[name] = {'min' : min(times), 'mean' : mean(times)}
+        
+        print(f'{name:<8} | min {min(times) * 1e3:>8.1f} ms | mean {mean(times) * 1e3:>8.1f} ms')
+    
+    if out:
+        with open(out, 'w') as f: json.dump(results, f, indent=2)
+    
+    return results
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Cold-start import time of the parse.py entry points.')
+    
+    parser.add_argument('--repeat', type=int, help='Number of cold starts per entry point.', default=5)
+    parser.add_argument('--out',    type=str, help='Path of the JSON summary.', default=None)
+    
+    args = parser.parse_args()
+    
+    main(args.repeat, args.out)
@@ -0,0 +1,249 @@
+from argparse import ArgumentParser
+import os
+import sys
+import json
+import time
+from copy import deepcopy
+
+from typing import Any, Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import cv2
+import numpy as np
+
+import parse
+from parser.events import to_events
+from parser.utils import Layout, get_layout
+
+FIXTURES_DIR = os.path.join(ROOT, 'bench', 'fixtures')
+GOLDEN_DIR   = os.path.join(ROOT, 'bench', 'golden')
+
+# Note bar colors of each hand (BGR, as drawn by open-cv)
+COLORS = {
+    'left'  : ('b', (255, 0, 0)),
+    'right' : ('g', (0, 255, 0)),
+    'pedal' : ('r', (0, 0, 255)),
+}
+
+# Synthetic fixtures: hand :> list of (notes, start, duration), with times
+# given in beats at 60 BPM (i.e. in seconds)
+FIXTURES = {
+    'scale' : {
+        'right' : [([note], float(i), 1.) for i, note in enumerate(['C-4', 'D-4', 'E-4', 'F-4', 'G-4', 'A-4', 'B-4', 'C-5'])],
+    },
+    'chords' : {
+        'left'  : [(['C-3', 'E-3', 'G-3'], 0., 2.), (['F-3', 'A-3', 'C-4'], 2., 2.), (['G-3', 'B-3', 'D-4'], 4., 2.), (['C-3', 'E-3', 'G-3'], 6., 2.)],
+        'right' : [(['E-4'], 0., 1.), (['G-4'], 1., 1.), (['A-4'], 2., .5), (['C-5'], 2.5, 1.5), (['B-4'], 4., 2.), (['C-5'], 6., 2.)],
+    },
+    'accidentals' : {
+        'left'  : [(['Bb-2'], 1., 2.), (['Eb-3'], 3., 2.)],
+        'right' : [(['Db-4', 'F-4'], 0., 1.), (['Gb-4'], 1., .5), (['Ab-4'], 1.5, .5), (['Bb-4', 'D-5'], 2., 3.)],
+    },
+    'trio' : {
+        'left'  : [(['C-3'], 0., 4.), (['G-2'], 4., 4.)],
+        'right' : [(['E-4'], 0., 2.), (['D-4'], 2., 2.), (['C-4'], 4., 4.)],
+        'pedal' : [(['C-2'], 0., 8.)],
+    },
+}
+
+# Fixtures whose score is known to fail, with the reason. Their notes are
+# still checked, while the score failing is reported but not counted
+XFAIL = {
+    'trio' : 'The held pedal note lasts 29 sixteenths, which fix_invalid cannot make valid with a single split (16 + 13)',
+}
+
+# Fraction of the note duration during which the key is released, so
+# that repeated notes are detected as two separate presses
+RELEASE = .1
+
+def make_fixture(
+    path : str,
+    script : Dict[str, List[Tuple[List[str], float, float]]],
+    layout : Layout,
+    fps : int = 30,
+    size : Tuple[int, int] = (1280, 720),
+    strip : int = 250,
+    pad : float = 1.,
+) -> None:
+    '''Draw a synthetic piano tutorial: the note bars of each hand are drawn
+    in the bottom strip of the frame, over the keys of the layout.
+    '''
+    width, height = size
+    white_kb, black_kb = layout.keys
+    white_sp, black_sp = layout.dims
+    half = .5 / len(white_kb)
+    
+    end = max(start + dur for notes in script.values() for _, start, dur in notes)
+    
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, size)
+    for idx in range(int((end + 2 * pad) * fps)):
+        t = idx / fps - pad
+        
+        frame = np.zeros((height, width, 3), dtype=np.uint8)
+        for hand, notes in script.items():
+            _, color = COLORS[hand]
+            for names, start, dur in notes:
+                if not start <= t < start + dur * (1 - RELEASE): continue
+                
+                for name in names:
+                    # White bars span the whole strip, black ones only part of it
+                    if name in white_kb: x, top, span = white_sp[white_kb.index(name)], .05, .9 * half
+                    else:                x, top, span = black_sp[black_kb.index(name)], .40, .6 * half
+                    
+                    cv2.rectangle(
+                        frame,
+                        (int((x - span) * width), height - int(strip * (1 - top))),
+                        (int((x + span) * width), height - 1),
+                        color,
+                        thickness=-1,
+                    )
+        
+        writer.write(frame)
+    
+    writer.release()
+
+def match_notes(
+    events : Dict[str, List[Dict[str, Any]]],
+    golden : Dict[str, List[Dict[str, Any]]],
+    tolerance : float = 50.,
+) -> Dict[str, float]:
+    '''Note-level comparison of the chord events against the golden ones.
+    A note matches a golden note of the same hand & name whose onset is
+    within the tolerance (ms), each golden note is matched at most once.
+    '''
+    def notes(chords : List[Dict[str, Any]]) -> List[Tuple[str, float]]:
+        return [(note['name'], chord['elapsed']) for chord in chords for note in chord['notes'] if note['name'] != 'R']
+    
+    num_pred, num_true, errors = 0, 0, []
+    for hand in set(events) | set(golden):
+        pred = notes(events.get(hand, []))
+        true = notes(golden.get(hand, []))
+        num_pred += len(pred)
+        num_true += len(true)
+        
+        used = set()
+        for name, onset in true:
+            best = min((
+                    (abs(onset - other), idx) for idx, (other_name, other) in enumerate(pred)
+                    if idx not in used and other_name == name and abs(onset - other) <= tolerance
+                ),
+                default=None,
+            )
+            if best is None: continue
+            
+            used.add(best[1])
+            errors.append(best[0])
+    
+    matched = len(errors)
+    return {
+        'precision' : matched / num_pred if num_pred else 1.,
+        'recall'    : matched / num_true if num_true else 1.,
+        'timing_error_ms' : float(np.mean(errors)) if errors else 0.,
+        'notes'        : num_pred,
+        'golden_notes' : num_true,
+    }
+
+def run(
+    name : str,
+    update : bool = False,
+    tolerance : float = 50.,
+    options : List[str] | None = None,
+) -> Dict[str, Any]:
+    from abjad import lilypond
+    
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    os.makedirs(GOLDEN_DIR,   exist_ok=True)
+    
+    script = FIXTURES[name]
+    video  = os.path.join(FIXTURES_DIR, f'{name}.avi')
+    
+    note_color = {hand : COLORS[hand][0] for hand in script}
+    args = parse.parse_args(['full', video, '--note_color', json.dumps(note_color), *(options or [])])
+    layout = get_layout(parse.get_configs(args))
+    
+    if not os.path.exists(video): make_fixture(video, script, layout)
+    
+    # * Extraction: the timed part of the harness
+    start = time.perf_counter()
+    music, info = parse.extract(args, layout=layout)
+    elapsed = time.perf_counter() - start
+    
+    fps = info['video_fraction'] * info['video_frame_count'] / elapsed
+    events = to_events(music)
+    
+    # * Score: the LilyPond source of the score block (rendering is not needed
+    #   to compare, and the file header depends on the installed LilyPond)
+    try:
+        _, _, file = parse.compose(deepcopy(music), args)
+        score = lilypond(file.items[-1])
+    
+    # Notes left invalid by fix_invalid fail the composition
+    except AssertionError:
+        if name not in XFAIL: raise
+        score = None
+    
+    golden_json = os.path.join(GOLDEN_DIR, f'{name}.json')
+    golden_ly   = os.path.join(GOLDEN_DIR, f'{name}.ly')
+    
+    if update:
+        with open(golden_json, 'w') as f: json.dump({'events' : events, 'fps' : fps}, f, indent=2)
+        if score is not None:
+            with open(golden_ly, 'w') as f: f.write(score)
+        elif os.path.exists(golden_ly): os.remove(golden_ly)
+    
+    with open(golden_json, 'r') as f: golden = json.load(f)
+    
+    ly = None
+    if os.path.exists(golden_ly):
+        with open(golden_ly, 'r') as f: ly = f.read()
+    
+    return {
+        **match_notes(events, golden['events'], tolerance=tolerance),
+        'fps' : fps,
+        'baseline_fps' : golden['fps'],
+        'speedup'      : fps / golden['fps'],
+        'ly_failed'    : score is None,
+        'ly_identical' : score is not None and score == ly,
+    }
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Accuracy & throughput regression harness against golden transcriptions.')
+    
+    parser.add_argument('fixtures', type=str, help=f'Fixtures to run among {list(FIXTURES)} (defaults to all).', nargs='*', default=[])
+    parser.add_argument('--update',     action='store_true', help='Re-generate the golden transcriptions.')
+    parser.add_argument('--tolerance',  type=float, help='Onset tolerance (ms) for two notes to match.', default=50.)
+    parser.add_argument('--fail_under', type=float, help='Fail if precision or recall fall below this value.', default=None)
+    parser.add_argument('--strict',     action='store_true', help='Fail if the LilyPond output differs from the golden one.')
+    parser.add_argument('--options',    type=str, help='Extra parse.py options, e.g. --options="--detect_scale .5".', default='')
+    parser.add_argument('--out',        type=str, help='Path of the JSON summary.', default=None)
+    
+    args = parser.parse_args()
+    
+    if unknown := set(args.fixtures) - set(FIXTURES): parser.error(f'Unknown fixtures: {sorted(unknown)}')
+    
+    summary = {
+        name : run(name, update=args.update, tolerance=args.tolerance, options=args.options.split())
+        for name in args.fixtures or FIXTURES
+    }
+    
+    failed = False
+    for name, res in summary.items():
+        ly = 'FAILED' if res['ly_failed'] else 'ok' if res['ly_identical'] else 'CHANGED'
+        if name in XFAIL: ly += ' (expected failure)' if res['ly_failed'] else ' (expected failure passed)'
+        
+        print(
+            f'{name:<12} | precision {res["precision"]:.3f} | recall {res["recall"]:.3f} | '
+            f'timing error {res["timing_error_ms"]:>6.1f} ms | {res["fps"]:>7.1f} fps '
+            f'(x{res["speedup"]:.2f}) | ly {ly}'
+        )
+        if name in XFAIL and res['ly_failed']: print(f'{"":<12} | {XFAIL[name]}')
+        
+        if args.fail_under is not None and min(res['precision'], res['recall']) < args.fail_under: failed = True
+        if args.strict and not res['ly_identical'] and not (name in XFAIL and res['ly_failed']): failed = True
+    
+    if args.out:
+        with open(args.out, 'w') as f: json.dump(summary, f, indent=2)
+    
+    sys.exit(int(failed))
@@ -1,18 +1,25 @@
-from argparse import ArgumentParser
+from argparse import ArgumentParser, BooleanOptionalAction
 from argparse import Namespace
+import os
+import sys
 import json
+from fractions import Fraction
+from typing import Any, Callable, Dict, List, Tuple, TYPE_CHECKING
 
-from abjad import BarLine, Clef, Duration, KeySignature, LilyPondFile, Meter, MetronomeMark, Mode, NamedPitchClass, Score, Staff, StaffGroup, Voice, attach, show
-
-from parser import extract_notes
-from parser import fix_invalid
-from parser.utils import get_layout
+# NOTE: Each stage imports its own heavy modules (see parser/__init__.py)
+from parser.music import RawChord
+from parser.utils import Layout, get_layout
 from parser.utils import Color, get_leaf
 from parser.utils import Configs, BLUE, GREEN
 
+if TYPE_CHECKING:
+    from abjad import LilyPondFile, Staff
+
+COMMANDS = ('extract', 'render', 'full')
+
 DEFAULT_CLEFS = {
-    'left' : {0, 'bass'},
-    'right': {0, 'treble'},
+    'left' : {0 : 'bass'},
+    'right': {0 : 'treble'},
 }
 
 DEFAULT_NOTES = {
@@ -20,12 +27,8 @@ DEFAULT_NOTES = {
     'right': GREEN,
 }
 
-def main(args : Namespace) -> None:
-    
-    report = print if args.verbose else lambda *a, **k: None
-    
-    # Create the overall configuration
-    config = Configs(
+def get_configs(args : Namespace) -> Configs:
+    return Configs(
         BPM            = args.bpm,
         BPM_UNIT       = args.bpm_unit,
         MIN_UNIT       = args.min_unit,
@@ -37,64 +40,141 @@ def main(args : Namespace) -> None:
         last_note      = args.last_note,
         notation       = args.notation,
     )
+
+def extract(
+    args : Namespace,
+    layout : Layout | None = None,
+    progress : Callable[[int, int], None] | None = None,
+) -> Tuple[
+    Dict[str, List[RawChord]],
+    Dict[str, Any],
+]:
+    from parser import extract_notes, open_source
+    from parser import PianoRoll, chords_from_roll
     
-    # Get the layout of the keys
-    layout = get_layout(config)
-    
-    # * Extract the notes from the video
-    music, info, frames = extract_notes(
-        args.path,
-        layout,
-        note_color=args.note_color,
-        configs=config,
-        skip_intro=args.skip_intro,
-        skip_outro=args.skip_outro,
-        early_stop=args.early_stop,
-        trim_areas=(slice(*args.trim_width), slice(*args.trim_height)),
-        verbose=args.verbose,
-    )
+    report = print if args.verbose else lambda *a, **k: None
+    
+    # Create the overall configuration & the layout of the keys
+    config = get_configs(args)
+    layout = layout or get_layout(config)
+    
+    # * Extract the notes from the video (or re-use a dumped piano roll)
+    if args.from_roll:
+        music, info = chords_from_roll(PianoRoll.open(args.from_roll), configs=config)
+        report(f'Notes extraction from piano roll returned the following information:')
+    
+    else:
+        with open_source(
+            args.path,
+            fps=args.fps,
+            timestamps=args.timestamps,
+            frame_size=args.frame_size,
+            workers=args.decode_workers,
+        ) as source:
+            music, info, frames = extract_notes(
+                source,
+                layout,
+                note_color=args.note_color,
+                configs=config,
+                skip_intro=args.skip_intro,
+                skip_outro=args.skip_outro,
+                early_stop=args.early_stop,
+                trim_areas=(slice(*args.trim_width), slice(*args.trim_height)),
+                detect_scale=args.detect_scale,
+                tracking=args.tracking,
+                hysteresis=args.hysteresis,
+                checkpoint=args.checkpoint,
+                checkpoint_every=args.checkpoint_every,
+                checkpoint_secs=args.checkpoint_secs,
+                resume=args.resume,
+                dump_roll=args.dump_roll,
+                dedup_window=args.dedup_window,
+                trace=args.trace,
+                progress=progress,
+                verbose=args.verbose,
+            )
+        
+        report(f'Notes extraction returned the following information:')
+        report(f'Parsed Frames:    {info["detected_frames"]}')
+        
+        # NOTE: Frames only cover this run, which may have resumed past the last change
+        if frames:
+            frame_height, frame_width = next(iter(frames.values()))[0].shape[:2]
+            report(f'Video Slice:      {frame_width}x{frame_height}')
     
-    frame_height, frame_width = next(iter(frames.values()))[0].shape[:2]
-    number_frames = {key : len(value) for key, value in frames.items()}
     notes_onsets  = {key : f'{val:.3f}' for key, val in info['notes_onset'].items()}
     notes_offsets = {key : f'{val:.3f}' for key, val in info['notes_offset'].items()}
-    report(f'Notes extraction returned the following information:')
     report(f'Hands:            {len(music)}')
-    report(f'Parsed Frames:    {number_frames}')
     report(f'Video FPS:        {info["video_fps"]:.3f}')
     report(f'Video Duration:   {info["video_frame_count"]}')
-    report(f'Video Explored:   {info["video_fraction"]:.2%}')
+    report(f'Video Explored:   {info.get("video_fraction", 0):.2%}')
     report(f'Video Resolution: {info["video_frame_width"]}x{info["video_frame_height"]}')
-    report(f'Video Slice:      {frame_width}x{frame_height}')
     report(f'Notes Onset:      {notes_onsets}')
     report(f'Notes Offset:     {notes_offsets}')
     report(f'Detected Notes:   {info["detected_chords"]}')
     
+    return music, info
+
+def compose(
+    music : Dict[str, List[RawChord]],
+    args : Namespace,
+) -> Tuple[
+    Dict[str, 'Staff'],
+    Callable[[int, int], str],
+    'LilyPondFile',
+]:
+    from abjad import BarLine, Clef, Duration, KeySignature, LilyPondFile, MetronomeMark, Mode, NamedPitchClass, Score, StaffGroup, attach
+    
+    from parser import fix_invalid, reconfigure
+    from parser import make_grid, run_sweep
+    from parser import build_staves
+    
+    config = get_configs(args)
+    
+    switches = {
+        'remove_empty'  : args.remove_empty,
+        'merge_invalid' : args.merge_invalid,
+        'split_invalid' : args.split_invalid,
+    }
+    
+    # * Sweep the post-processing settings & keep the best one
+    if args.sweep:
+        grid = make_grid(
+            config,
+            bpm=args.sweep_bpm,
+            bpm_unit=args.sweep_bpm_unit,
+            min_unit=args.sweep_min_unit,
+            switches=None if args.sweep_fix else switches,
+        )
+        
+        results = run_sweep(music, grid, workers=args.workers)
+        
+        print(f'Sweep of {len(results)} post-processing settings (best first):')
+        for rank, result in enumerate(results): print(f'{rank + 1:>4}. {result}')
+        
+        best = results[0]
+        config, switches = best.configs, best.switches
+        args.bpm, args.bpm_unit, args.min_unit = config.BPM, config.BPM_UNIT, config.MIN_UNIT
+        music = {hand : reconfigure(chords, config) for hand, chords in music.items()}
+    
     # * Fix invalid notes via pruning & merging
     for hand in music:
-        music[hand] = fix_invalid(music[hand])
+        music[hand] = fix_invalid(music[hand], **switches)
     
     # Check that all notes in the music are valid
     for hand, chord in music.items():
         for note in chord: assert note.valid, f'Invalid note: {str(note)} | On music: {hand}'
     
-    # * Create the Abjad Voice & Staves
-    staves = {
-        hand : Staff([
-                Voice([
-                    chord.abjad for chord in voice if chord
-                ],
-                name=f'{hand} Voice'),
-            ], name=f'{hand} Staff'
-        )
-        for hand, voice in music.items()
-    }
-    
-    # Rewrite meter if requested by user
-    if args.rewrite:
-        meter = Meter(args.time_signature, preferred_boundary_depth=args.boundary_depth)
-        for hand in args.rewrite:
-            Meter.rewrite_meter(staves[hand], meter)
+    # * Create the Abjad Voice & Staves, in measure-aligned chunks built in
+    #   parallel & meter-rewritten (if requested by user) bar by bar
+    staves = build_staves(
+        music,
+        config,
+        rewrite=args.rewrite,
+        boundary_depth=args.boundary_depth,
+        chunk_bars=args.chunk_bars,
+        workers=args.workers,
+    )
     
     # * Create the Abjad Score
     key_signature = KeySignature(NamedPitchClass(args.key), Mode(args.mode))
@@ -111,6 +191,8 @@ def main(args : Namespace) -> None:
         attach(BarLine('|.'), staff[-1][-1])
     
     for hand, clefs in args.clefs.items():
+        # The default clefs may mention hands missing from the video
+        if hand not in staves: continue
         for bar, clef in clefs.items():
             attach(Clef(clef), get_leaf(staves[hand][0][int(bar)]))
     
@@ -122,78 +204,204 @@ def main(args : Namespace) -> None:
     )
     score = Score([group], name=f'Piano Score - {args.name}')
     
-    preamble = fr'''
-        # (set-global-staff-size 20)
-        \header {{
+    def preamble(idx : int = 0, num : int = 1) -> str:
+        # Only the first section carries the titles, the last one the tagline
+        titles = fr'''
             composer = \markup {{ {args.composer} }}
             subtitle = \markup {{ {args.subtitle} }}
             title = \markup {{ {args.title} }}
-            tagline = "{args.tagline}"
-        }}
+        ''' if idx == 0 else ''
+        tagline = f'"{args.tagline}"' if idx == num - 1 else '##f'
+        
+        # Page numbers would restart in every section of a split score
+        paper = r'\paper { print-page-number = ##f }' if num > 1 else ''
+        
+        return fr'''
+            # (set-global-staff-size 20)
+            \header {{
+                {titles}
+                tagline = {tagline}
+            }}
+            
+            \layout {{
+                indent = 0
+            }}
+            
+            {paper}
+        '''
+    
+    return staves, preamble, LilyPondFile([preamble(), score])
 
-        \layout {{
-            indent = 0
-        }}
-    '''
+def render(
+    music : Dict[str, List[RawChord]],
+    args : Namespace,
+) -> None:
+    from abjad import get, io, show
+    
+    from parser import section_bounds, split_sections, render_sections
+    
+    staves, preamble, file = compose(music, args)
     
-    # * Create the LilyPond file & render the score
-    file = LilyPondFile([preamble, score])
+    # NOTE: Configuration is read after composing as the sweep may update it
+    config = get_configs(args)
     
+    # * Render the score in independent sections, merged into a single PDF
+    if args.section_bars or args.section_clefs:
+        # NOTE: As in `compose`, the clefs of hands missing from the video are skipped
+        breaks = [
+            int(get.timespan(staves[hand][0][int(bar)]).start_offset // Fraction(*config.time_signature))
+            for hand, clefs in args.clefs.items() if hand in staves
+            for bar in clefs
+        ] if args.section_clefs else None
+        
+        bounds   = section_bounds(staves, config, section_bars=args.section_bars, breaks=breaks)
+        sections = split_sections(staves, bounds, name=f'Piano Score - {args.name}')
+        
+        path = render_sections(sections, preamble, args.out_dir, args.out_name, workers=args.workers)
+        if args.open: io.open_file(path)
+        
+        return
+    
+    # * Render the whole score at once
     show(
         file,
         output_directory=args.out_dir,
         render_prefix=args.out_name,
         should_open=args.open,
     )
+
+def main(args : Namespace) -> None:
+    from parser import dump_music, load_music
     
-if __name__ == '__main__':
-    parser = ArgumentParser()
+    match args.command:
+        case 'extract':
+            music, info = extract(args)
+            dump_music(music, info, args.out_chords or os.path.join(args.out_dir, f'{args.out_name}.json'))
+        case 'render':
+            music, _ = load_music(args.chords, get_configs(args))
+            render(music, args)
+        case 'full':
+            music, _ = extract(args)
+            render(music, args)
+
+def get_parser() -> ArgumentParser:
+    # Arguments for the configuration, shared by all the commands
+    configs = ArgumentParser(add_help=False)
+    configs.add_argument('--bpm',            type=int, help='Beats per minute.', default=60)
+    configs.add_argument('--bpm_unit',       type=int, help='Unit of beats per minute.', default=4)
+    configs.add_argument('--min_unit',       type=int, help='Minimum unit of duration.', default=16)
+    configs.add_argument('--central_octave', type=int, help='Central octave of the piano.', default=3)
+    configs.add_argument('--start_octave',   type=int, help='Starting octave of the piano.', default=1)
+    configs.add_argument('--num_octaves',    type=int, help='Number of octaves in the piano.', default=7)
+    configs.add_argument('--first_note',     type=str, help='First note of the piano.', default='D')
+    configs.add_argument('--last_note',      type=str, help='Last note of the piano.', default='G')
+    configs.add_argument('--notation',       type=str, help='Notation style.', choices=['flat', 'sharp'], default='flat')
+    configs.add_argument('--time_signature', type=str, help='Time signature of the score.', default=(4, 4), nargs='+')
+    configs.add_argument('--out_dir',  type=str, help='Output directory for the rendered score.', default='.')
+    configs.add_argument('--out_name', type=str, help='Output name for the rendered score.', default='score')
+    configs.add_argument('--verbose', action='store_true', help='Enable verbose output.')
+    
+    # Arguments for the extraction of the notes from the video
+    extract = ArgumentParser(add_help=False)
+    extract.add_argument('path', type=str, help='Path to the video file (or frame directory, or raw .rgb frames file) to parse for score, not needed with --from_roll.', default=None, nargs='?')
     
-    parser.add_argument('path', type=str, help='Path to the video file to parse for score.')
-    
-    # Arguments for the configuration
-    parser.add_argument('--skip_intro',     type=int, help='Number of intro frames to skip.', default=None)
-    parser.add_argument('--skip_outro',     type=int, help='Number of outro frames to skip.', default=None)
-    parser.add_argument('--early_stop',     type=int, help='Number of frames to stop early.', default=None)
-    parser.add_argument('--bpm',            type=int, help='Beats per minute.', default=60)
-    parser.add_argument('--bpm_unit',       type=int, help='Unit of beats per minute.', default=4)
-    parser.add_argument('--min_unit',       type=int, help='Minimum unit of duration.', default=16)
-    parser.add_argument('--central_octave', type=int, help='Central octave of the piano.', default=3)
-    parser.add_argument('--start_octave',   type=int, help='Starting octave of the piano.', default=1)
-    parser.add_argument('--num_octaves',    type=int, help='Number of octaves in the piano.', default=7)
-    parser.add_argument('--first_note',     type=str, help='First note of the piano.', default='D')
-    parser.add_argument('--last_note',      type=str, help='Last note of the piano.', default='G')
-    parser.add_argument('--notation',       type=str, help='Notation style.', choices=['flat', 'sharp'], default='flat')
-    parser.add_argument('--time_signature', type=str, help='Time signature of the score.', default=(4, 4), nargs='+')
-    
-    parser.add_argument('--note_color',  type=str, help='Color of the notes to extract.', default=DEFAULT_NOTES)
-    parser.add_argument('--trim_width',  type=int, help='Slice start-end to trim frame along width dimension.', default=(-250, None), nargs=2)
-    parser.add_argument('--trim_height', type=int, help='Slice start-end to trim frame along width dimension.', default=(None, None), nargs=2)
+    # Arguments for frame directories & raw frame files
+    extract.add_argument('--fps',            type=float, help='Declared frame rate of a frame sequence.', default=None)
+    extract.add_argument('--timestamps',     type=str,   help='Sidecar file with the timestamp (ms) of each frame, one per line.', default=None)
+    extract.add_argument('--frame_size',     type=int,   help='Width & height of raw .rgb frames.', default=None, nargs=2)
+    extract.add_argument('--decode_workers', type=int,   help='Number of threads decoding image frames.', default=None)
+    
+    extract.add_argument('--skip_intro',     type=int, help='Number of intro frames to skip.', default=None)
+    extract.add_argument('--skip_outro',     type=int, help='Number of outro frames to skip.', default=None)
+    extract.add_argument('--early_stop',     type=int, help='Number of frames to stop early.', default=None)
+    
+    extract.add_argument('--note_color',  type=str, help='Color of the notes to extract.', default=DEFAULT_NOTES)
+    extract.add_argument('--trim_width',  type=int, help='Slice start-end to trim frame along width dimension.', default=(-250, None), nargs=2)
+    extract.add_argument('--trim_height', type=int, help='Slice start-end to trim frame along width dimension.', default=(None, None), nargs=2)
+    extract.add_argument('--detect_scale', type=float, help='Downscale factor of the trimmed frame used for detection.', default=1.)
+    extract.add_argument('--tracking',     action='store_true', help='Track the notes across frames with persistent ids.')
+    extract.add_argument('--hysteresis',   type=int, help='Consecutive frames for a tracked note to appear & vanish.', default=(2, 2), nargs=2)
+    extract.add_argument('--dedup_window', type=int, help='Frames of the fingerprint window used to reuse repeated passages.', default=None)
+    
+    # Arguments for checkpointing long extractions
+    extract.add_argument('--checkpoint',       type=str,   help='Path of the extraction checkpoint file.', default=None)
+    extract.add_argument('--checkpoint_every', type=int,   help='Store a checkpoint every N frames.', default=None)
+    extract.add_argument('--checkpoint_secs',  type=float, help='Store a checkpoint every N seconds.', default=None)
+    extract.add_argument('--resume', action='store_true', help='Resume the extraction from the checkpoint file.')
+    
+    # Arguments for the piano roll intermediate format
+    extract.add_argument('--dump_roll', type=str, help='Path prefix where to dump the per-frame piano roll.', default=None)
+    extract.add_argument('--trace',     type=str, help='Path of the Chrome trace of the extraction (.json or .json.gz).', default=None)
+    extract.add_argument('--from_roll', type=str, help='Path prefix of a dumped piano roll to use instead of the video.', default=None)
+    
+    # Arguments for the post-processing of the extracted notes
+    render = ArgumentParser(add_help=False)
+    render.add_argument('--remove_empty',  action=BooleanOptionalAction, help='Remove empty chords.', default=True)
+    render.add_argument('--merge_invalid', action=BooleanOptionalAction, help='Merge chords with invalid duration.', default=True)
+    render.add_argument('--split_invalid', action=BooleanOptionalAction, help='Split chords with invalid duration.', default=True)
+    
+    # Arguments for the post-processing sweep
+    render.add_argument('--sweep',          action='store_true', help='Sweep the post-processing settings and render the best one.')
+    render.add_argument('--sweep_bpm',      type=int, help='Beats per minute to sweep.', default=None, nargs='+')
+    render.add_argument('--sweep_bpm_unit', type=int, help='Units of beats per minute to sweep.', default=None, nargs='+')
+    render.add_argument('--sweep_min_unit', type=int, help='Minimum units of duration to sweep.', default=None, nargs='+')
+    render.add_argument('--sweep_fix',      action='store_true', help='Sweep all the combinations of the invalid-fixing switches.')
+    render.add_argument('--workers',        type=int, help='Number of worker processes.', default=None)
     
     # Arguments for the score
-    parser.add_argument('--clefs',    type=str, help='Clefs for each hand.', default=DEFAULT_CLEFS)
-    parser.add_argument('--rewrite',  type=str, help='Rewrite the meter for the given hand.', default=[], nargs='+')
-    parser.add_argument('--key',      type=str, help='Key signature of the score.', default='C')
-    parser.add_argument('--mode',     type=str, help='Mode of the score.', choices=['major', 'minor'], default='major')
-    parser.add_argument('--mood',     type=str, help='Textual indication of beats per minute.', default='')
-    parser.add_argument('--composer', type=str, help='Composer of the score.', default='')
-    parser.add_argument('--subtitle', type=str, help='Subtitle of the score.', default='')
-    parser.add_argument('--title',    type=str, help='Title of the score.', default='')
-    parser.add_argument('--tagline',  type=str, help='Tagline of the score.', default='')
-    parser.add_argument('--name',     type=str, help='Name of the score.', default='Untitled')
-    parser.add_argument('--out_dir',  type=str, help='Output directory for the rendered score.', default='.')
-    parser.add_argument('--out_name', type=str, help='Output name for the rendered score.', default='score')
-    parser.add_argument('--boundary_depth', type=int, help='Preferred boundary depth for meter rewriting.', default=1)
-    
-    parser.add_argument('--open',    action='store_true', help='Open the rendered score after rendering.')
-    parser.add_argument('--verbose', action='store_true', help='Enable verbose output.')
-    
-    args = parser.parse_args()
+    render.add_argument('--clefs',    type=str, help='Clefs for each hand.', default=DEFAULT_CLEFS)
+    render.add_argument('--rewrite',  type=str, help='Rewrite the meter for the given hand.', default=[], nargs='+')
+    render.add_argument('--key',      type=str, help='Key signature of the score.', default='C')
+    render.add_argument('--mode',     type=str, help='Mode of the score.', choices=['major', 'minor'], default='major')
+    render.add_argument('--mood',     type=str, help='Textual indication of beats per minute.', default='')
+    render.add_argument('--composer', type=str, help='Composer of the score.', default='')
+    render.add_argument('--subtitle', type=str, help='Subtitle of the score.', default='')
+    render.add_argument('--title',    type=str, help='Title of the score.', default='')
+    render.add_argument('--tagline',  type=str, help='Tagline of the score.', default='')
+    render.add_argument('--name',     type=str, help='Name of the score.', default='Untitled')
+    render.add_argument('--boundary_depth', type=int, help='Preferred boundary depth for meter rewriting.', default=1)
+    render.add_argument('--chunk_bars',     type=int, help='Number of bars per chunk of the parallel score assembly.', default=16)
+    render.add_argument('--section_bars',   type=int, help='Render the score in sections of (at least) N bars.', default=None)
+    render.add_argument('--section_clefs',  action='store_true', help='Start a new render section at each clef change.')
+    
+    render.add_argument('--open',    action='store_true', help='Open the rendered score after rendering.')
+    
+    parser = ArgumentParser()
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    extract_cmd = commands.add_parser('extract', parents=[configs, extract], help='Extract the notes from the video into a JSON chords file.')
+    extract_cmd.add_argument('--out_chords', type=str, help='Path of the output chords file (defaults to <out_dir>/<out_name>.json).', default=None)
+    
+    render_cmd = commands.add_parser('render', parents=[configs, render], help='Render the score from a JSON chords file.')
+    render_cmd.add_argument('chords', type=str, help='Path to the chords file produced by the extract command.')
+    
+    commands.add_parser('full', parents=[configs, extract, render], help='Extract the notes from the video and render the score.')
+    
+    return parser
+
+def parse_args(argv : List[str] | None = None) -> Namespace:
+    argv = sys.argv[1:] if argv is None else argv
+    
+    # Running without a command defaults to the full pipeline
+    if argv and argv[0] not in (*COMMANDS, '-h', '--help'): argv = ['full', *argv]
+    
+    parser = get_parser()
+    args = parser.parse_args(argv)
+    
+    # A dumped piano roll replaces the video
+    if args.command != 'render' and not (args.path or args.from_roll):
+        parser.error('the following arguments are required: path (or --from_roll)')
     
     # Parse the dictionary from the string
-    if isinstance(args.clefs,      str): args.clefs      = json.loads(args.clefs)
-    if isinstance(args.note_color, str): args.note_color = json.loads(args.note_color)
+    if isinstance(getattr(args, 'clefs',      None), str): args.clefs      = json.loads(args.clefs)
+    if isinstance(getattr(args, 'note_color', None), str): args.note_color = json.loads(args.note_color)
     if isinstance(args.time_signature, list): args.time_signature = tuple([int(x) for x in args.time_signature])
-    args.note_color = { hand : Color.from_str(color) for hand, color in args.note_color.items() }
+    if hasattr(args, 'note_color'):
+        args.note_color = { hand : Color.from_str(color) if isinstance(color, str) else color for hand, color in args.note_color.items() }
+    
+    return args
 
+if __name__ == '__main__':
+    args = parse_args()
+    
     main(args)
\ No newline at end of file
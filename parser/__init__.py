@@ -1,2 +1,28 @@
-from .video import extract_notes
-from .music import fix_invalid
\ No newline at end of file
+from importlib import import_module
+
+# NOTE: Sub-modules are imported lazily on first access (PEP 562), so that
+#       the extraction never pays for abjad and the rendering for cv2/PIL
+_LAZY = {
+    'extract_notes'    : '.video',
+    'open_source'      : '.source',
+    'fix_invalid'      : '.music',
+    'reconfigure'      : '.music',
+    'PianoRoll'        : '.roll',
+    'chords_from_roll' : '.roll',
+    'make_grid'        : '.sweep',
+    'run_sweep'        : '.sweep',
+    'dump_music'       : '.events',
+    'load_music'       : '.events',
+    'build_staves'     : '.score',
+    'section_bounds'   : '.engrave',
+    'split_sections'   : '.engrave',
+    'engrave_sections' : '.engrave',
+    'render_sections'  : '.engrave',
+}
+
+__all__ = list(_LAZY)
+
+def __getattr__(name : str):
+    if name not in _LAZY: raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    
+    return getattr(import_module(_LAZY[name], __name__), name)
\ No newline at end of file
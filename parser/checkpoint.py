@@ -0,0 +1,60 @@
+import os
+import pickle
+import tempfile
+from dataclasses import dataclass
+
+from typing import Dict, List, TYPE_CHECKING
+
+from .utils import Box
+
+if TYPE_CHECKING:
+    from .music import RawChord
+    from .tracker import NoteTracker
+
+@dataclass
+class Checkpoint:
+    '''Snapshot of the state of the note extraction main loop, enough
+    to resume a long-running extraction where it was interrupted and
+    produce the same output as an uninterrupted run.
+    '''
+    position   : int # Index of the next video frame to decode
+    num_frames : int # Number of frames processed by the main loop
+    
+    old_objs : Dict[str, List[Box]]
+    last     : Dict[str, float] # Elapsed time (ms) of the last change for each hand
+    chords   : Dict[str, List['RawChord']]
+    
+    # Elapsed time (ms) of the first & last change, and number of changes
+    # for each hand. The change frames themselves are never stored, as their
+    # images would make every checkpoint grow with the length of the video
+    onset   : Dict[str, float]
+    offset  : Dict[str, float]
+    changes : Dict[str, int]
+    tracker : 'NoteTracker | None' = None
+    
+    def save(self, path : str) -> None:
+        '''Atomically write the checkpoint to disk, so that an interruption
+        while saving never leaves a corrupted checkpoint behind.
+        '''
+        root = os.path.dirname(os.path.abspath(path))
+        
+        fd, tmp = tempfile.mkstemp(dir=root, prefix='.ckpt-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+    
+    @staticmethod
+    def load(path : str) -> 'Checkpoint':
+        with open(path, 'rb') as f:
+            ckpt = pickle.load(f)
+        
+        if not isinstance(ckpt, Checkpoint):
+            raise ValueError(f'Not a valid checkpoint file: {path}')
+        
+        return ckpt
@@ -0,0 +1,60 @@
+from typing import Dict, Hashable, List
+
+# Modulus (Mersenne prime) & base of the polynomial rolling hash
+MOD  = (1 << 61) - 1
+BASE = 1_000_003
+
+class SegmentIndex:
+    '''Rolling fingerprint index of the per-frame detection signatures, i.e.
+    the keys active for each hand. The fingerprint of the last `window`
+    frames is looked up among the ones of all the earlier windows, so that
+    a repeated passage is found as soon as its first `window` frames have
+    been decoded. Windows with less than `min_changes` signature changes
+    (e.g. a long sustained chord) never match, as they say nothing about
+    what comes next.
+    '''
+    def __init__(self, window : int = 60, min_changes : int = 4) -> None:
+        if window < 2: raise ValueError(f'Fingerprint window should be at least two frames, got: {window}')
+        
+        self.window = window
+        self.min_changes = min_changes
+        
+        self.sigs  : List[Hashable] = []
+        self.index : Dict[int, int] = {}
+        
+        self.hash = 0
+        self.changes = 0
+        self.power = pow(BASE, window, MOD)
+    
+    def __len__(self) -> int:
+        return len(self.sigs)
+    
+    def __getitem__(self, idx : int) -> Hashable:
+        return self.sigs[idx]
+    
+    def push(self, sig : Hashable) -> int | None:
+        '''Append the signature of the next frame.
+        
+        Returns:
+            int | None: Index of the last frame of an earlier, non-overlapping
+                window with the same signatures as the last one, if any.
+        '''
+        self.sigs.append(sig)
+        n, w = len(self.sigs) - 1, self.window
+        
+        self.hash = (self.hash * BASE + hash(sig)) % MOD
+        if n > 0: self.changes += sig != self.sigs[n - 1]
+        
+        if n >= w:
+            self.hash = (self.hash - hash(self.sigs[n - w]) * self.power) % MOD
+            self.changes -= self.sigs[n - w + 1] != self.sigs[n - w]
+        
+        if n < w - 1 or self.changes < self.min_changes: return None
+        
+        match = self.index.setdefault(self.hash, n)
+        
+        # Discard overlapping windows & fingerprint collisions
+        if match > n - w: return None
+        if self.sigs[match - w + 1 : match + 1] != self.sigs[n - w + 1 : n + 1]: return None
+        
+        return match
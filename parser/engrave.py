@@ -0,0 +1,234 @@
+import os
+import uuid
+import shutil
+import hashlib
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
+
+from typing import Callable, Dict, Iterable, List, Tuple, TYPE_CHECKING
+
+from .utils import Configs
+
+if TYPE_CHECKING:
+    from abjad import Score, Staff
+
+def section_bounds(
+    staves : Dict[str, 'Staff'],
+    configs : Configs,
+    section_bars : int | None = None,
+    breaks : Iterable[int] | None = None,
+) -> List[Tuple[Fraction, Fraction]]:
+    '''Find the (start, stop) offsets of the score sections. Sections can
+    only start on a bar line where every hand has a note starting (or has
+    already ended), so that no note is cut in two by a section boundary.
+    Leaves continuing a tie (e.g. split at bar lines by the meter rewrite)
+    are not the start of a note.
+    
+    Args:
+        staves (Dict[str, Staff]): The staff of each hand.
+        configs (Configs): The score configuration.
+        section_bars (int, optional): Minimum number of bars per section. Defaults to None.
+        breaks (Iterable[int], optional): Bars where a new section should start (as soon
+            as possible). Defaults to None.
+    
+    Returns:
+        List[Tuple[Fraction, Fraction]]: The start & stop offsets of each section.
+    '''
+    from abjad import get, select
+    
+    num, den = configs.time_signature
+    bar = Fraction(num, den)
+    
+    length = {hand : Fraction(get.duration(staff)) for hand, staff in staves.items()}
+    starts = {
+        hand : {
+            Fraction(get.timespan(leaf).start_offset)
+            for leaf in select.leaves(staff)
+            if get.logical_tie(leaf).head is leaf
+        }
+        for hand, staff in staves.items()
+    }
+    
+    total = max(length.values())
+    valid = [
+        k for k in range(1, int(total // bar) + 1)
+        if k * bar < total and all(k * bar in starts[hand] or k * bar >= length[hand] for hand in staves)
+    ]
+    
+    breaks = sorted(set(breaks or []))
+    
+    bounds, last = [0], 0
+    for k in valid:
+        # Cut as soon as the section is long enough or a break is reached
+        if (section_bars and k - last >= section_bars) or any(last < b <= k for b in breaks):
+            bounds.append(k)
+            last = k
+    
+    offsets = [k * bar for k in bounds] + [total]
+    return list(zip(offsets[:-1], offsets[1:]))
+
+def split_sections(
+    staves : Dict[str, 'Staff'],
+    bounds : List[Tuple[Fraction, Fraction]],
+    name : str = 'Piano Score',
+) -> List['Score']:
+    '''Split the score into independent section scores. Leaves are copied
+    together with their indicators, while the clef & key signature in effect
+    at the start of each section are restated on its first leaf.
+    '''
+    from abjad import Clef, KeySignature, Score, Skip, Staff, StaffGroup, Voice
+    from abjad import attach, get, mutate, select
+    
+    leaves = {hand : select.leaves(staff) for hand, staff in staves.items()}
+    
+    sections = []
+    for idx, (start, stop) in enumerate(bounds):
+        group = []
+        for hand in list(staves)[::-1]:
+            chunk = [leaf for leaf in leaves[hand] if start <= get.timespan(leaf).start_offset < stop]
+            copies = mutate.copy(chunk) if chunk else []
+            
+            for indicator in (Clef, KeySignature):
+                if not chunk: break
+                effective = get.effective(chunk[0], indicator)
+                if effective and get.indicator(copies[0], indicator) is None:
+                    attach(effective, copies[0])
+            
+            # Pad the hands ending before the section does
+            missing = (stop - start) - sum((Fraction(get.duration(leaf)) for leaf in copies), Fraction(0))
+            if missing > 0: copies.append(Skip('s1', multiplier=(missing.numerator, missing.denominator)))
+            
+            group.append(Staff([Voice(copies, name=f'{hand} Voice')], name=f'{hand} Staff'))
+        
+        sections.append(Score([
+            StaffGroup(
+                group,
+                name='Piano Staff Group',
+                lilypond_type='PianoStaff',
+                simultaneous=True,
+            )
+        ], name=f'{name} - Section {idx}'))
+    
+    return sections
+
+def engrave(source : str) -> str:
+    '''Engrave the LilyPond source into a PDF stored next to it. The PDF
+    is only put in place once LilyPond succeeds, so that a failed or
+    interrupted run never leaves a partial (or broken) PDF behind.
+    '''
+    lilypond = shutil.which('lilypond')
+    if lilypond is None: raise RuntimeError('Could not find the lilypond executable')
+    
+    # NOTE: Paths are made absolute as lilypond runs from the source directory
+    source = os.path.abspath(source)
+    prefix, _ = os.path.splitext(source)
+    partial = f'{prefix}.{uuid.uuid4().hex}.partial'
+    try:
+        subprocess.run(
+            [lilypond, '--pdf', '--silent', '-o', partial, source],
+            check=True,
+            cwd=os.path.dirname(source),
+        )
+        os.replace(f'{partial}.pdf', f'{prefix}.pdf')
+    finally:
+        if os.path.exists(f'{partial}.pdf'): os.remove(f'{partial}.pdf')
+    
+    return f'{prefix}.pdf'
+
+def engrave_sections(
+    sections : List['Score'],
+    preamble : Callable[[int, int], str],
+    out_dir : str,
+    out_name : str,
+    workers : int | None = None,
+) -> List[str]:
+    '''Engrave the score sections in parallel. Each section is also emitted
+    as its own `.ly` include (together with a master `.ly` file including
+    all of them). Sections are cached by the hash of their LilyPond source,
+    so that only the sections which changed since the last run are engraved
+    again, while the cache entries of the sections gone are removed.
+    
+    Args:
+        sections (List[Score]): The section scores.
+        preamble (Callable[[int, int], str]): Preamble of the i-th section out of n.
+        out_dir (str): Output directory for the rendered score.
+        out_name (str): Output name for the rendered score.
+        workers (int, optional): Number of parallel LilyPond processes. Defaults to None.
+    
+    Returns:
+        List[str]: The path to the PDF of each section.
+    '''
+    from abjad import LilyPondFile, lilypond
+    
+    root  = os.path.join(out_dir, f'{out_name}-sections')
+    cache = os.path.join(root, 'cache')
+    os.makedirs(cache, exist_ok=True)
+    
+    n = len(sections)
+    includes, sources = [], []
+    for idx, section in enumerate(sections):
+        # The section as include-able file for the master score
+        include = os.path.join(root, f'section-{idx:03d}.ly')
+        with open(include, 'w') as f: f.write(f'\\score {{\n{lilypond(section)}\n}}\n')
+        includes.append(include)
+        
+        # The stand-alone section source, named after its content hash
+        source = lilypond(LilyPondFile([preamble(idx, n), section]))
+        digest = hashlib.sha256(source.encode()).hexdigest()
+        sources.append((os.path.join(cache, digest), source))
+    
+    master = LilyPondFile([
+        preamble(0, 1),
+        *[f'\\include "{os.path.basename(include)}"' for include in includes],
+    ])
+    with open(os.path.join(root, f'{out_name}.ly'), 'w') as f: f.write(lilypond(master))
+    
+    # Drop the cache entries no section uses any more (or left by failed runs)
+    keep = {f'{os.path.basename(prefix)}{ext}' for prefix, _ in sources for ext in ('.ly', '.pdf')}
+    for name in os.listdir(cache):
+        if name not in keep: os.remove(os.path.join(cache, name))
+    
+    # Engrave the sections which are not cached yet
+    missing = []
+    for prefix, source in sources:
+        if os.path.exists(f'{prefix}.pdf'): continue
+        with open(f'{prefix}.ly', 'w') as f: f.write(source)
+        missing.append(f'{prefix}.ly')
+    
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(engrave, missing))
+    
+    return [f'{prefix}.pdf' for prefix, _ in sources]
+
+def render_sections(
+    sections : List['Score'],
+    preamble : Callable[[int, int], str],
+    out_dir : str,
+    out_name : str,
+    workers : int | None = None,
+) -> str:
+    '''Render the score sections in parallel (see `engrave_sections`) and
+    merge them into a single PDF.
+    
+    Args:
+        sections (List[Score]): The section scores.
+        preamble (Callable[[int, int], str]): Preamble of the i-th section out of n.
+        out_dir (str): Output directory for the rendered score.
+        out_name (str): Output name for the rendered score.
+        workers (int, optional): Number of parallel LilyPond processes. Defaults to None.
+    
+    Returns:
+        str: The path to the merged PDF.
+    '''
+    from pypdf import PdfWriter
+    
+    paths = engrave_sections(sections, preamble, out_dir, out_name, workers=workers)
+    
+    # Merge the sections into the final PDF
+    out = os.path.join(out_dir, f'{out_name}.pdf')
+    writer = PdfWriter()
+    for path in paths: writer.append(path)
+    with open(out, 'wb') as f: writer.write(f)
+    
+    return out
@@ -0,0 +1,71 @@
+import json
+from collections import defaultdict
+
+from typing import Any, Dict, List, Tuple
+
+from .utils import Configs
+from .music import RawNote, RawChord
+
+def to_events(music : Dict[str, List[RawChord]]) -> Dict[str, List[Dict[str, Any]]]:
+    '''Convert the chords of each hand into plain chord events, i.e. the
+    elapsed time (ms) of the chord and the name & raw timing of its notes.
+    Notes are sorted by name so that the events are stable across runs.
+    '''
+    return {
+        hand : [
+            {
+                'elapsed' : float(chord.elapsed),
+                'notes' : [
+                    {
+                        'name' : note.name,
+                        'time' : float(note.time),
+                        'sustained'  : note.sustained,
+                        'stop_slur'  : note.stop_slur,
+                        'start_slur' : note.start_slur,
+                        'start_tie'  : note.start_tie,
+                    }
+                    for note in sorted(chord, key=lambda note: note.name)
+                ],
+            }
+            for chord in chords
+        ]
+        for hand, chords in music.items()
+    }
+
+def from_events(
+    events : Dict[str, List[Dict[str, Any]]],
+    configs : Configs = Configs(),
+) -> Dict[str, List[RawChord]]:
+    music : Dict[str, List[RawChord]] = defaultdict(list)
+    for hand, chords in events.items():
+        for chord in chords:
+            music[hand].append(RawChord(
+                {RawNote(**note) for note in chord['notes']},
+                configs,
+                elapsed=chord['elapsed'],
+            ))
+    
+    return music
+
+def dump_music(
+    music : Dict[str, List[RawChord]],
+    info : Dict[str, Any],
+    path : str,
+) -> None:
+    '''Store the extracted chords (and the extraction info) as JSON chord
+    events, so that the rendering can run without decoding the video.
+    '''
+    with open(path, 'w') as f:
+        json.dump({'info' : info, 'music' : to_events(music)}, f, indent=2, default=float)
+
+def load_music(
+    path : str,
+    configs : Configs = Configs(),
+) -> Tuple[
+    Dict[str, List[RawChord]],
+    Dict[str, Any],
+]:
+    with open(path, 'r') as f:
+        data = json.load(f)
+    
+    return from_events(data['music'], configs), data['info']
@@ -1,13 +1,13 @@
 from dataclasses import dataclass, field
 from copy import copy, deepcopy
 
-from abjad import Note, Rest, Chord, attach, StartSlur, StopSlur
-from abjad import Duration, PersistentIndicatorError, AssignabilityError
-
 from .utils.misc import Configs, Notes
 from .utils.misc import NOTE_ORDER, to_ms
 
-from typing import List, Set
+from typing import Any, Dict, List, Set, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from abjad import Note, Rest, Chord, Duration
 
 @dataclass
 class RawNote:
@@ -18,9 +18,12 @@ class RawNote:
     sustained  : bool = False
     stop_slur  : bool = False
     start_slur : bool = False
+    start_tie  : bool = False # The note carries on in the next chord
     
     @property
-    def duration(self) -> Duration:
+    def duration(self) -> 'Duration':
+        from abjad import Duration
+        
         value = round(
             self.time / (self.info.SEC_IN_MIN / self.info.BPM /
             (self.info.MIN_UNIT / self.info.BPM_UNIT) * self.info.MS_IN_SEC)
@@ -33,6 +36,8 @@ class RawNote:
     
     @property
     def valid(self) -> bool:
+        from abjad import Note, AssignabilityError
+        
         try:
             _ = Note('a', self.duration)
             return True
@@ -44,7 +49,9 @@ class RawNote:
         return self.duration > 0
     
     @property
-    def abjad(self) -> Note | Rest:
+    def abjad(self) -> 'Note | Rest':
+        from abjad import Note, Rest, attach, StartSlur, StopSlur
+        
         if self.name == 'R': return Rest(self.duration)
         
         note = Note(
@@ -84,9 +91,10 @@ class RawNote:
             sustained  = self.sustained ,
             stop_slur  = self.stop_slur ,
             start_slur = self.start_slur,
+            start_tie  = self.start_tie ,
         )
-        
-        
+    
+    
     
     def __radd__(self, other : int) -> 'RawNote':
         return RawNote(
@@ -95,6 +103,7 @@ class RawNote:
             sustained=self.sustained,
             stop_slur=self.stop_slur,
             start_slur=self.start_slur,
+            start_tie=self.start_tie,
         )
     
     def __str__(self) -> str:
@@ -115,7 +124,7 @@ class RawNote:
         '''We use the __repr__ method to provide the Lilypond notation
         for the note. This is useful when we want to convert the RawNote
         into a Lilypond note.
-
+        
         Returns:
             str: Lilypond notation for the note.
         '''
@@ -133,16 +142,15 @@ class RawChord:
         self,
         notes : str | List[str] | RawNote | Set[RawNote],
         info : Configs = None,
-        time : float | Duration = 0,
+        time : 'float | Duration' = 0,
         
         # FIXME: Missing support for __add__ for elapsed
         elapsed : float = 0,
-        
+    
     ) -> None:
         info = info or Configs()
-        if isinstance(time, Duration):
-            # Convert duration to ms
-            n, d = time.pair
+        if not isinstance(time, (int, float)):
+            # Convert (abjad) duration to ms
             time = to_ms(time, info)
         if isinstance(notes, str)    : notes = set([RawNote(notes, time)])
         if isinstance(notes, list)   : notes = set([RawNote(note,  time) for note in notes])
@@ -156,11 +164,13 @@ class RawChord:
         # for note in self._notes: note.time = time
     
     @property
-    def notes(self) -> List[Note]:
+    def notes(self) -> List['Note']:
         return [note.abjad for note in self._notes if note.duration > 0]
     
     @property
-    def duration(self) -> Duration:
+    def duration(self) -> 'Duration':
+        from abjad import Duration
+        
         return Duration(
             max([note.duration for note in self._notes])
         )
@@ -174,7 +184,10 @@ class RawChord:
         return all(note.valid for note in self._notes)
     
     @property
-    def abjad(self) -> Chord | Rest:
+    def abjad(self) -> 'Chord | Rest':
+        from abjad import Rest, Chord, attach, StartSlur, StopSlur
+        from abjad import PersistentIndicatorError
+        
         if any(isinstance(note, Rest) for note in self.notes): return Rest(self.duration)
         
         chord = Chord(self.notes, self.duration)
@@ -192,7 +205,7 @@ class RawChord:
     
     def set_time(self, time : float) -> None:
         for note in self._notes: note.time = time
-        
+    
     def __eq__(self, other : 'RawChord') -> bool:
         return self._notes == other._notes
     
@@ -211,9 +224,9 @@ class RawChord:
             )
             
             return chord
-            
-        else: return self
         
+        else: return self
+    
     def __radd__(self, other : int) -> 'RawChord':
         return RawChord({other + note for note in self}, self._info)
     
@@ -258,45 +271,59 @@ def fix_invalid(
     remove_empty  : bool = True,
     merge_invalid : bool = True,
     split_invalid : bool = True,
+    stats : Dict[str, int] | None = None,
 ) -> List[RawChord]:
+    # Keep track of the applied fixes if requested
+    stats = stats if stats is not None else {}
+    for key in ('merged', 'dropped', 'split'): stats.setdefault(key, 0)
+    
     # Initialize the output list to the provided chords
     out = copy(chords)
     
     # * Try to patch invalid duration via merging
-    tmp : List[RawChord] = []
-    i = 0
-    while merge_invalid and i < len(chords) - 2:
-        curr, next, post = chords[i], chords[i+1], chords[i+2]
-        
-        # This duration is invalid, try to merge with previous
-        if not curr.valid and next.valid and post.valid and curr & next and curr & post:
-            # Incorporate the curr & post chords into the prev one
-            tmp.append(next.time + post.time + curr)
-            i += 2
-        else: tmp.append(curr)
+    if merge_invalid:
+        tmp : List[RawChord] = []
+        i = 0
+        while i < len(chords) - 2:
+            curr, next, post = chords[i], chords[i+1], chords[i+2]
+            
+            # This duration is invalid, try to merge with previous
+            if not curr.valid and next.valid and post.valid and curr & next and curr & post:
+                # Incorporate the curr & post chords into the prev one
+                tmp.append(next.time + post.time + curr)
+                stats['merged'] += len(next) + len(post)
+                i += 2
+            else: tmp.append(curr)
+            
+            i += 1
         
-        i += 1
-    else:
-        out = tmp
+        out = tmp + chords[i:]
     
     # * Remove empty chords
-    tmp : List[RawChord] = []
-    
-    i = 0
-    while remove_empty and i < len(out) - 1:
-        if out[i]:
-            tmp.append(out[i])
-        else:
-            out[i+1] += out[i]
-        i += 1
-    else:
+    if remove_empty:
+        tmp : List[RawChord] = []
+        
+        i = 0
+        while i < len(out) - 1:
+            if out[i]:
+                tmp.append(out[i])
+            else:
+                out[i+1] += out[i]
+                stats['dropped'] += len(out[i])
+            i += 1
+        
+        # Last chord has nothing to be carried over to
+        if out and out[-1]: tmp.append(out[-1])
+        elif out: stats['dropped'] += len(out[-1])
+        
         out = tmp
     
     # * Split invalid chords
     if split_invalid:
         tmp = []
         for chord in out:
-            if not chord.valid:
+            # Empty chords (kept when not removed) have nothing to split
+            if not chord.valid and chord.duration > 0:
                 d1 = chord.duration.equal_or_lesser_power_of_two
                 d2 = chord.duration - d1
                 
@@ -311,6 +338,7 @@ def fix_invalid(
                 
                 tmp.append(chord1)
                 tmp.append(chord2)
+                stats['split'] += len(chord)
             else:
                 tmp.append(chord)
         out = tmp
@@ -331,4 +359,52 @@ def mark_sustained(chords : List[RawChord]) -> List[RawChord]:
                 note.stop_slur = True
         i += 1
     
-    return chords
\ No newline at end of file
+    return chords
+
+def align_hands(
+    chords : Dict[str, List[RawChord]],
+    info : Dict[str, Any],
+    configs : Configs,
+    tolerance : int = 2,
+) -> Dict[str, List[RawChord]]:
+    '''Align the tracks (hands, pedals, duet parts...) on a common timeline
+    by padding with rests the ones starting after the earliest onset or
+    ending before the latest offset, computed in one pass over all tracks.
+    
+    Args:
+        chords (Dict[str, List[RawChord]]): The chords of each track.
+        info (Dict[str, Any]): The extraction info with the tracks onset/offset (in ms).
+        configs (Configs): The score configuration.
+        tolerance (int, optional): Number of video frames of tolerance. Defaults to 2.
+    
+    Returns:
+        Dict[str, List[RawChord]]: The aligned chords of each track.
+    '''
+    onset, offset = info['notes_onset'], info['notes_offset']
+    if not onset: return chords
+    
+    # Tolerance is given in frames, timings are in ms
+    fps = info['video_fps']
+    tol = tolerance * configs.MS_IN_SEC / fps if fps else 0
+    
+    start = min(onset .values())
+    stop  = max(offset.values())
+    for key in onset:
+        if (lead := onset[key] - start) > tol: chords[key] = [RawChord('R', time=lead, info=configs), *chords[key]]
+        if (tail := stop - offset[key]) > tol: chords[key].append(RawChord('R', time=tail, info=configs))
+    
+    return chords
+
+def reconfigure(
+    chords : List[RawChord],
+    configs : Configs,
+) -> List[RawChord]:
+    '''Copy the chords under a new score configuration, e.g. a different
+    BPM or minimum duration unit, while keeping the raw timings.
+    '''
+    chords = deepcopy(chords)
+    for chord in chords:
+        chord._info = configs
+        for note in chord: note.info = configs
+    
+    return chords
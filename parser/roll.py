@@ -0,0 +1,211 @@
+import os
+import json
+import numpy as np
+from collections import defaultdict
+
+from typing import Any, Dict, Iterable, List, Tuple
+
+from .utils import Configs
+from .music import RawChord, align_hands
+
+class PianoRoll:
+    '''Dense per-frame, per-key activation matrix (frames x keys x hands)
+    stored as memory-mapped .npy files alongside the frame timestamps.
+    It is a cheap intermediate format: once a video has been decoded, the
+    chords can be re-built from the roll without decoding again.
+    
+    The roll is stored as four files sharing the same prefix:
+        - <prefix>.roll.npy   : uint8 activations of shape (frames, keys, hands)
+        - <prefix>.change.npy : uint8 chord change flags of shape (frames, hands)
+        - <prefix>.time.npy   : float64 elapsed time (ms) of each frame
+        - <prefix>.json       : keys, hands, number of valid frames & video info
+    
+    The change flags mark the frames where the extraction started a new chord,
+    which also happens when the boxes move while the active keys do not.
+    '''
+    def __init__(
+        self,
+        path : str,
+        roll : np.ndarray,
+        time : np.ndarray,
+        keys : List[str],
+        hands : List[str],
+        count : int = 0,
+        meta : Dict[str, Any] | None = None,
+        change : np.ndarray | None = None,
+    ) -> None:
+        self.path  = path
+        self.roll  = roll
+        self.time  = time
+        self.change = change
+        self.keys  = keys
+        self.hands = hands
+        self.count = count
+        self.meta  = meta or {}
+        
+        self._key_idx = {key : i for i, key in enumerate(keys)}
+    
+    @staticmethod
+    def create(
+        path : str,
+        num_frames : int,
+        keys : List[str],
+        hands : List[str],
+        meta : Dict[str, Any] | None = None,
+    ) -> 'PianoRoll':
+        roll = np.lib.format.open_memmap(
+            f'{path}.roll.npy',
+            mode='w+',
+            dtype=np.uint8,
+            shape=(num_frames, len(keys), len(hands)),
+        )
+        time = np.lib.format.open_memmap(
+            f'{path}.time.npy',
+            mode='w+',
+            dtype=np.float64,
+            shape=(num_frames,),
+        )
+        change = np.lib.format.open_memmap(
+            f'{path}.change.npy',
+            mode='w+',
+            dtype=np.uint8,
+            shape=(num_frames, len(hands)),
+        )
+        
+        return PianoRoll(path, roll, time, keys, hands, meta=meta, change=change)
+    
+    @staticmethod
+    def open(path : str, mode : str = 'r') -> 'PianoRoll':
+        with open(f'{path}.json', 'r') as f:
+            meta = json.load(f)
+        
+        roll = np.load(f'{path}.roll.npy', mmap_mode=mode)
+        time = np.load(f'{path}.time.npy', mmap_mode=mode)
+        
+        # NOTE: Rolls dumped before the change flags only hold the active keys
+        change = np.load(f'{path}.change.npy', mmap_mode=mode) if os.path.exists(f'{path}.change.npy') else None
+        
+        return PianoRoll(
+            path,
+            roll,
+            time,
+            meta.pop('keys'),
+            meta.pop('hands'),
+            count=meta.pop('count'),
+            meta=meta,
+            change=change,
+        )
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def __getitem__(self, hand : str) -> np.ndarray:
+        return self.roll[:self.count, :, self.hands.index(hand)]
+    
+    @property
+    def elapsed(self) -> np.ndarray:
+        return self.time[:self.count]
+    
+    def record(
+        self,
+        idx : int,
+        elapsed : float,
+        notes : Dict[str, List[str]],
+        changed : Iterable[str] = (),
+    ) -> None:
+        '''Store the active keys of each hand at the given frame index, and
+        the hands starting a new chord at that frame.
+        '''
+        self.time[idx] = elapsed
+        self.roll[idx] = 0
+        for h, hand in enumerate(self.hands):
+            for note in notes.get(hand, []):
+                if note == 'R': continue
+                self.roll[idx, self._key_idx[note], h] = 1
+        
+        if self.change is not None:
+            self.change[idx] = [hand in changed for hand in self.hands]
+    
+    def flush(self, count : int) -> None:
+        '''Flush the memory-mapped arrays and update the number of valid
+        frames in the metadata file.
+        '''
+        self.count = count
+        self.roll.flush()
+        self.time.flush()
+        if self.change is not None: self.change.flush()
+        
+        with open(f'{self.path}.json', 'w') as f:
+            json.dump({
+                'keys'  : self.keys,
+                'hands' : self.hands,
+                'count' : self.count,
+                **self.meta,
+            }, f)
+
+def chords_from_roll(
+    roll : PianoRoll,
+    configs : Configs = Configs(),
+) -> Tuple[
+    Dict[str, List[RawChord]],
+    Dict[str, Any],
+]:
+    '''Re-build the chords of each hand from a dumped piano roll. A new
+    chord is emitted at every frame flagged as a change of the hand, as in
+    the `extract_notes` main loop. Rolls without change flags can only be
+    segmented where the set of active keys changes, which misses the chords
+    split by boxes moving without their keys changing.
+    
+    Args:
+        roll (PianoRoll): The piano roll dumped by `extract_notes`.
+        configs (Configs, optional): The score configuration. Defaults to Configs().
+    
+    Returns:
+        Tuple[Dict[str, List[RawChord]], Dict[str, Any]]: The chords of each
+            hand and the extraction info needed by the post-processing.
+    '''
+    keys = np.array(roll.keys)
+    time = np.asarray(roll.elapsed)
+    
+    chords : Dict[str, List[RawChord]] = defaultdict(list)
+    onsets : Dict[str, np.ndarray] = {}
+    for hand in roll.hands:
+        act = np.asarray(roll[hand])
+        if len(act) == 0: continue
+        
+        # Find the frames where the hand changes chord, the first frame
+        # is the initial chord if the hand is already playing
+        if roll.change is not None:
+            idxs = np.flatnonzero(roll.change[:roll.count, roll.hands.index(hand)])
+        else:
+            idxs = np.flatnonzero(np.any(act[1:] != act[:-1], axis=1)) + 1
+            if act[0].any(): idxs = np.concatenate(([0], idxs))
+        if len(idxs) == 0: continue
+        
+        onsets[hand] = idxs
+        for n, idx in enumerate(idxs):
+            # Mark timing for previous chords as we got a new one
+            if n > 0:
+                chords[hand][-1].set_time(time[idx] - time[idxs[n - 1]])
+            
+            notes = keys[np.flatnonzero(act[idx])].tolist() or 'R'
+            chords[hand].append(RawChord(
+                notes,
+                configs,
+                elapsed=time[idx] if idx > 0 else 0,
+            ))
+    
+    # As in `extract_notes`, hands are sorted by their first change
+    onsets = dict(sorted(onsets.items(), key=lambda item: (item[1][0], roll.hands.index(item[0]))))
+    chords = {k : chords[k] for k in onsets}
+    
+    info = {
+        **roll.meta,
+        'notes_onset'  : {k : time[v[ 0]] for k, v in onsets.items()},
+        'notes_offset' : {k : time[v[-1]] for k, v in onsets.items()},
+        'detected_chords' : {k : len(v) for k, v in chords.items()},
+    }
+    
+    chords = align_hands(chords, info, configs)
+    
+    return chords, info
@@ -0,0 +1,135 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import parent_process
+from fractions import Fraction
+from itertools import repeat
+
+from typing import Dict, List, Tuple, TYPE_CHECKING
+
+from .utils import Configs
+from .music import RawChord
+
+if TYPE_CHECKING:
+    from abjad import Staff, Voice
+
+def split_measures(
+    chords : List[RawChord],
+    configs : Configs,
+    chunk_bars : int = 16,
+) -> List[List[RawChord]]:
+    '''Split the chords into chunks spanning (at least) the given number
+    of bars. Chunks are only cut where a chord starts exactly on a bar line,
+    so that each chunk can be meter-rewritten on its own.
+    '''
+    num, den = configs.time_signature
+    bar = Fraction(num, den)
+    
+    chunks : List[List[RawChord]] = [[]]
+    offset = start = Fraction(0)
+    for chord in chords:
+        if chunks[-1] and offset % bar == 0 and offset - start >= chunk_bars * bar:
+            chunks.append([])
+            start = offset
+        
+        chunks[-1].append(chord)
+        offset += Fraction(*chord.duration.pair)
+    
+    return [chunk for chunk in chunks if chunk]
+
+def build_chunk(
+    chords : List[RawChord],
+    rewrite : bool,
+    time_signature : Tuple[int, int],
+    boundary_depth : int,
+) -> 'Voice':
+    '''Build the abjad Voice of a measure-aligned chunk of chords and
+    optionally rewrite its meter. The meter is rewritten bar by bar (notes
+    crossing a bar line are split & tied), so that the result does not
+    depend on how the chords were chunked.
+    
+    Chords with notes carrying on in the next chord are tied to it. Ties are
+    only attached once the meter is rewritten: abjad would otherwise fuse
+    the tied chords as if they had the same notes, while LilyPond only ties
+    the notes shared by both chords.
+    '''
+    from abjad import Duration, Meter, Staff, Tie, Voice
+    from abjad import attach, get, mutate, select
+    
+    staff = Staff([Voice([chord.abjad for chord in chords])])
+    
+    if rewrite:
+        meter = Meter(time_signature, preferred_boundary_depth=boundary_depth)
+        for bar in mutate.split(staff[0][:], [Duration(time_signature)], cyclic=True):
+            Meter.rewrite_meter(bar, meter)
+    
+    # Offsets where the tied chords end
+    ties, offset = set(), Fraction(0)
+    for chord in chords:
+        offset += Fraction(*chord.duration.pair)
+        if any(note.start_tie for note in chord): ties.add(offset)
+    
+    for leaf in select.leaves(staff):
+        if get.timespan(leaf).stop_offset in ties and get.indicator(leaf, Tie) is None:
+            attach(Tie(), leaf)
+    
+    return staff[0]
+
+def build_staves(
+    music : Dict[str, List[RawChord]],
+    configs : Configs,
+    rewrite : List[str] | None = None,
+    boundary_depth : int = 1,
+    chunk_bars : int = 16,
+    workers : int | None = None,
+) -> Dict[str, 'Staff']:
+    '''Assemble the staff of each hand. The chords are split into chunks
+    of measures which are built (and meter-rewritten) in parallel worker
+    processes, per hand and per chunk, and then concatenated in order. A
+    single chunk, or a caller already running in a worker process (e.g. a
+    render job of the service), builds them in-process instead.
+    
+    Args:
+        music (Dict[str, List[RawChord]]): The (valid) chords of each hand.
+        configs (Configs): The score configuration.
+        rewrite (List[str], optional): Hands whose meter should be rewritten. Defaults to None.
+        boundary_depth (int, optional): Preferred boundary depth for meter rewriting. Defaults to 1.
+        chunk_bars (int, optional): Minimum number of bars per chunk. Defaults to 16.
+        workers (int, optional): Number of worker processes. Defaults to None (all cores).
+    
+    Returns:
+        Dict[str, Staff]: The staff of each hand.
+    '''
+    from abjad import Staff, Voice
+    
+    rewrite = rewrite or []
+    
+    # Only non-empty chords make it into the score
+    jobs = [
+        (hand, chunk)
+        for hand, voice in music.items()
+        for chunk in split_measures([chord for chord in voice if chord], configs, chunk_bars)
+    ]
+    
+    hands, chunks = zip(*jobs) if jobs else ((), ())
+    args = (
+        chunks,
+        [hand in rewrite for hand in hands],
+        repeat(configs.time_signature),
+        repeat(boundary_depth),
+    )
+    
+    if len(chunks) <= 1 or workers == 1 or parent_process() is not None:
+        voices = list(map(build_chunk, *args))
+    
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            voices = list(pool.map(build_chunk, *args))
+    
+    staves = {
+        hand : Staff([Voice(name=f'{hand} Voice')], name=f'{hand} Staff')
+        for hand in music
+    }
+    
+    for hand, voice in zip(hands, voices):
+        staves[hand][0].extend(voice[:])
+    
+    return staves
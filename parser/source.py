@@ -0,0 +1,257 @@
+import os
+import re
+import cv2
+import numpy as np
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from typing import Deque, List, Tuple
+
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+RAW_EXTS   = ('.rgb',)
+
+# Name of the timestamps sidecar looked up inside frame directories
+SIDECAR = 'timestamps.txt'
+
+def _natural_key(name : str) -> List[str | int]:
+    '''Sort key comparing the runs of digits as integers, so that unpadded
+    frame names (f1, f2, ..., f10) are sorted in frame order.
+    '''
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', name)]
+
+class Source(ABC):
+    '''Sequential reader of the frames to parse. Frames are returned as
+    (ret, image, elapsed) triplets, with the image in BGR order unless the
+    source is flagged as `rgb` and the elapsed time in milliseconds. Sources
+    are context managers, closed on exit.
+    '''
+    rgb : bool = False
+    
+    fps : float
+    frame_count : int
+    width  : int
+    height : int
+    
+    @abstractmethod
+    def read(self) -> Tuple[bool, np.ndarray | None, float]:
+        ...
+    
+    @abstractmethod
+    def seek(self, position : int) -> None:
+        ...
+    
+    @property
+    @abstractmethod
+    def position(self) -> int:
+        '''Index of the next frame to read.'''
+    
+    def close(self) -> None:
+        pass
+    
+    def __enter__(self) -> 'Source':
+        return self
+    
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+class VideoSource(Source):
+    '''Frames decoded from a video container by open-cv.'''
+    grab_limit : int = 64
+    
+    def __init__(self, path : str) -> None:
+        self.capture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            raise ValueError(f'Could not open video file: {path}')
+        
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS)
+        self.frame_count = int(self.capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.width  = int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    
+    def read(self) -> Tuple[bool, np.ndarray | None, float]:
+        ret, image = self.capture.read()
+        return ret, image, self.capture.get(cv2.CAP_PROP_POS_MSEC)
+    
+    def seek(self, position : int) -> None:
+        # Short forward seeks are cheaper by grabbing (without retrieving) the
+        # frames in between than by re-decoding from the previous key frame
+        ahead = position - self.position
+        if 0 <= ahead <= self.grab_limit:
+            for _ in range(ahead): self.capture.grab()
+        
+        else: self.capture.set(cv2.CAP_PROP_POS_FRAMES, position)
+    
+    @property
+    def position(self) -> int:
+        return int(self.capture.get(cv2.CAP_PROP_POS_FRAMES))
+    
+    def close(self) -> None:
+        self.capture.release()
+
+class _Sequence(Source):
+    '''Frames stored one by one (or packed) on disk, timed either by the
+    sidecar timestamps (ms) or by the declared frame rate.
+    '''
+    def __init__(
+        self,
+        frame_count : int,
+        fps : float | None = None,
+        timestamps : str | None = None,
+    ) -> None:
+        if timestamps:
+            self.times = np.loadtxt(timestamps, dtype=np.float64, ndmin=1)
+            if len(self.times) < frame_count:
+                raise ValueError(f'Expected {frame_count} timestamps, got {len(self.times)}: {timestamps}')
+            
+            span = self.times[frame_count - 1] - self.times[0] if frame_count > 1 else 0
+            self.fps = fps or ((frame_count - 1) * 1e3 / span if span > 0 else 0.)
+        
+        elif fps:
+            self.times = np.arange(frame_count) * 1e3 / fps
+            self.fps = fps
+        
+        else:
+            raise ValueError('Frame sequences need either a timestamps sidecar or a declared fps')
+        
+        self.frame_count = frame_count
+        self._position = 0
+    
+    @property
+    def position(self) -> int:
+        return self._position
+
+class ImageSequence(_Sequence):
+    '''Directory of compressed frames (PNG, JPEG, ...) in frame order. The
+    frames are decoded ahead of the reader by a pool of threads, open-cv
+    releases the GIL while decoding so the prefetch runs truly in parallel.
+    '''
+    def __init__(
+        self,
+        files : List[str],
+        fps : float | None = None,
+        timestamps : str | None = None,
+        workers : int | None = None,
+        prefetch : int = 16,
+    ) -> None:
+        super().__init__(len(files), fps=fps, timestamps=timestamps)
+        
+        first = cv2.imread(files[0]) if files else None
+        if first is None: raise ValueError(f'Could not decode frame: {files[0] if files else None}')
+        self.height, self.width, *_ = first.shape
+        
+        self.files = files
+        self.prefetch = prefetch
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.queue : Deque[Future] = deque()
+    
+    def _fill(self) -> None:
+        # Keep the queue full with the frames following the current one
+        while len(self.queue) < self.prefetch and self._position + len(self.queue) < self.frame_count:
+            self.queue.append(self.pool.submit(cv2.imread, self.files[self._position + len(self.queue)]))
+    
+    def read(self) -> Tuple[bool, np.ndarray | None, float]:
+        self._fill()
+        if not self.queue: return False, None, 0.
+        
+        image = self.queue.popleft().result()
+        if image is None: raise ValueError(f'Could not decode frame: {self.files[self._position]}')
+        
+        elapsed = float(self.times[self._position])
+        self._position += 1
+        
+        return True, image, elapsed
+    
+    def seek(self, position : int) -> None:
+        for future in self.queue: future.cancel()
+        self.queue.clear()
+        self._position = position
+    
+    def close(self) -> None:
+        self.seek(self._position)
+        self.pool.shutdown()
+
+class RawFrames(_Sequence):
+    '''Uncompressed RGB frames, either packed in a single file or stored
+    one per file. Files are memory-mapped and frames are returned as
+    read-only views, so no frame is ever copied before being trimmed.
+    '''
+    rgb = True
+    
+    def __init__(
+        self,
+        files : List[str],
+        frame_size : Tuple[int, int],
+        fps : float | None = None,
+        timestamps : str | None = None,
+    ) -> None:
+        self.width, self.height = frame_size
+        shape = (self.height, self.width, 3)
+        
+        self.packs : List[np.ndarray] = []
+        for file in files:
+            size = os.path.getsize(file)
+            if size % np.prod(shape):
+                raise ValueError(f'Size of raw frames file {file} is not a multiple of a {self.width}x{self.height} RGB frame')
+            
+            self.packs.append(np.memmap(file, dtype=np.uint8, mode='r', shape=(size // np.prod(shape), *shape)))
+        
+        # Index of the first frame of each pack
+        self.starts = np.cumsum([0, *[len(pack) for pack in self.packs]])
+        
+        super().__init__(int(self.starts[-1]), fps=fps, timestamps=timestamps)
+    
+    def read(self) -> Tuple[bool, np.ndarray | None, float]:
+        if self._position >= self.frame_count: return False, None, 0.
+        
+        pack = int(np.searchsorted(self.starts, self._position, side='right')) - 1
+        image = np.asarray(self.packs[pack][self._position - self.starts[pack]])
+        elapsed = float(self.times[self._position])
+        self._position += 1
+        
+        return True, image, elapsed
+    
+    def seek(self, position : int) -> None:
+        self._position = position
+
+def open_source(
+    path : str,
+    fps : float | None = None,
+    timestamps : str | None = None,
+    frame_size : Tuple[int, int] | None = None,
+    workers : int | None = None,
+) -> Source:
+    '''Open the frames to parse: a video file, a directory of image (or raw
+    .rgb) frames read in the natural order of their names, or a single file
+    of packed raw .rgb frames.
+    
+    Args:
+        path (str): Path to the video file, frame directory or raw frames file.
+        fps (float, optional): Declared frame rate of frame sequences. Defaults to None.
+        timestamps (str, optional): Sidecar file with the timestamp (ms) of each frame,
+            one per line. Defaults to None (<path>/timestamps.txt for directories).
+        frame_size (Tuple[int, int], optional): Width & height of raw frames. Defaults to None.
+        workers (int, optional): Number of image decoding threads. Defaults to None.
+    
+    Returns:
+        Source: The opened frame source.
+    '''
+    if os.path.isdir(path):
+        sidecar = os.path.join(path, SIDECAR)
+        if timestamps is None and os.path.exists(sidecar): timestamps = sidecar
+        
+        names = sorted(os.listdir(path), key=_natural_key)
+        raw    = [os.path.join(path, name) for name in names if name.lower().endswith(RAW_EXTS)]
+        images = [os.path.join(path, name) for name in names if name.lower().endswith(IMAGE_EXTS)]
+        
+        if raw and images: raise ValueError(f'Frame directory mixes raw and image frames: {path}')
+        if not raw and not images: raise ValueError(f'No frames found in directory: {path}')
+    
+    elif path.lower().endswith(RAW_EXTS): raw, images = [path], []
+    else: return VideoSource(path)
+    
+    if raw:
+        if frame_size is None: raise ValueError('Raw frames need a declared frame size')
+        return RawFrames(raw, frame_size, fps=fps, timestamps=timestamps)
+    
+    return ImageSequence(images, fps=fps, timestamps=timestamps, workers=workers)
@@ -0,0 +1,134 @@
+from dataclasses import dataclass, field, replace
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+
+from typing import Dict, Iterable, List, Tuple
+
+from .utils import Configs
+from .utils.misc import to_ms
+from .music import RawChord, fix_invalid, reconfigure
+
+SWITCHES = ('remove_empty', 'merge_invalid', 'split_invalid')
+
+# Raw chords of the sweep, sent once to each worker process
+_MUSIC : Dict[str, List[RawChord]] = {}
+
+@dataclass
+class SweepResult:
+    configs  : Configs
+    switches : Dict[str, bool] = field(default_factory=dict)
+    
+    invalid : int = 0 # Notes still invalid after the fixes
+    merged  : int = 0 # Notes merged into the previous chord
+    split   : int = 0 # Notes split into two chords
+    dropped : int = 0 # Notes dropped as empty
+    error   : float = 0 # Total timing error (ms) w.r.t. raw elapsed times
+    
+    @property
+    def rank(self) -> Tuple[int, int, float]:
+        '''Ranking key (lower is better): renderable scores first, then the
+        ones needing the fewest fixes, then the most accurate timing.
+        '''
+        return self.invalid, self.merged + self.split + self.dropped, self.error
+    
+    def __str__(self) -> str:
+        switches = ' '.join(f'{"+" if v else "-"}{k}' for k, v in self.switches.items())
+        return (
+            f'BPM {self.configs.BPM:>4} | BPM_UNIT {self.configs.BPM_UNIT:>3} | MIN_UNIT {self.configs.MIN_UNIT:>3} | '
+            f'invalid {self.invalid:>4} | merged {self.merged:>4} | split {self.split:>4} | dropped {self.dropped:>4} | '
+            f'error {self.error / 1e3:>8.2f}s | {switches}'
+        )
+
+def timing_error(chords : List[RawChord], configs : Configs) -> float:
+    '''Total drift (ms) between the quantized chord onsets and the raw
+    elapsed times at which the chords were detected in the video.
+    '''
+    onset, error = 0., 0.
+    ref, seen = None, set()
+    for chord in chords:
+        # Only detected chords carry an elapsed time, split chords share it
+        if chord.elapsed and chord.elapsed not in seen:
+            seen.add(chord.elapsed)
+            if ref is None: ref = chord.elapsed - onset
+            error += abs(onset - (chord.elapsed - ref))
+        
+        if chord._notes: onset += to_ms(chord.duration, configs)
+    
+    return error
+
+def evaluate(
+    music : Dict[str, List[RawChord]],
+    setting : Tuple[Configs, Dict[str, bool]],
+) -> SweepResult:
+    '''Run the post-processing of the extracted music under the given
+    configuration and score the outcome.
+    '''
+    configs, switches = setting
+    result = SweepResult(configs, switches)
+    
+    for chords in music.values():
+        stats = {}
+        chords = fix_invalid(reconfigure(chords, configs), stats=stats, **switches)
+        
+        result.invalid += sum(not note.valid for chord in chords for note in chord)
+        result.merged  += stats['merged']
+        result.split   += stats['split']
+        result.dropped += stats['dropped']
+        result.error   += timing_error(chords, configs)
+    
+    return result
+
+def _init(music : Dict[str, List[RawChord]]) -> None:
+    global _MUSIC
+    _MUSIC = music
+
+def _evaluate(setting : Tuple[Configs, Dict[str, bool]]) -> SweepResult:
+    return evaluate(_MUSIC, setting)
+
+def make_grid(
+    configs : Configs,
+    bpm      : Iterable[int] | None = None,
+    bpm_unit : Iterable[int] | None = None,
+    min_unit : Iterable[int] | None = None,
+    switches : Dict[str, bool] | None = None,
+) -> List[Tuple[Configs, Dict[str, bool]]]:
+    '''Build the grid of post-processing settings to sweep. Parameters
+    left to None are kept at their value in the base configuration, while
+    the `fix_invalid` switches are swept over all combinations unless
+    explicitly provided.
+    '''
+    bpm      = bpm      or [configs.BPM]
+    bpm_unit = bpm_unit or [configs.BPM_UNIT]
+    min_unit = min_unit or [configs.MIN_UNIT]
+    
+    flags = [switches] if switches else [
+        dict(zip(SWITCHES, values)) for values in product((True, False), repeat=len(SWITCHES))
+    ]
+    
+    return [
+        (replace(configs, BPM=b, BPM_UNIT=u, MIN_UNIT=m), flag)
+        for b, u, m, flag in product(bpm, bpm_unit, min_unit, flags)
+    ]
+
+def run_sweep(
+    music : Dict[str, List[RawChord]],
+    grid : List[Tuple[Configs, Dict[str, bool]]],
+    workers : int | None = None,
+) -> List[SweepResult]:
+    '''Evaluate a grid of post-processing settings in parallel over a pool
+    of processes. The extraction is only run once: each worker receives the
+    raw chords once (when it starts) and re-runs the cheap post-processing.
+    
+    Args:
+        music (Dict[str, List[RawChord]]): The raw chords of each hand.
+        grid (List[Tuple[Configs, Dict[str, bool]]]): The settings to evaluate.
+        workers (int, optional): Number of worker processes. Defaults to None (all cores).
+    
+    Returns:
+        List[SweepResult]: The evaluated settings, ranked from best to worst.
+    '''
+    music = dict(music)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init, initargs=(music,)) as pool:
+        results = list(pool.map(_evaluate, grid))
+    
+    return sorted(results, key=lambda result: result.rank)
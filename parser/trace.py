@@ -0,0 +1,81 @@
+import os
+import gzip
+import json
+import time
+import queue
+import threading
+
+from typing import Any, Dict, Tuple
+
+class Tracer:
+    '''Event-level trace of the extraction in the Chrome trace format, which
+    can be inspected offline in chrome://tracing or Perfetto. The main loop
+    only enqueues raw tuples, while a background thread formats and writes
+    the events to disk (gzip-compressed if the path ends with `.gz`).
+    
+    Timestamps are given as `time.perf_counter()` values and stored in
+    microseconds since the creation of the tracer.
+    '''
+    def __init__(self, path : str) -> None:
+        self.path = path
+        self.pid  = os.getpid()
+        self.origin  = time.perf_counter()
+        self.threads : Dict[str, int] = {}
+        
+        self.queue : queue.SimpleQueue = queue.SimpleQueue()
+        self.file = gzip.open(path, 'wt') if path.endswith('.gz') else open(path, 'w')
+        self.writer = threading.Thread(target=self._write, name='trace-writer', daemon=True)
+        self.writer.start()
+    
+    def thread(self, name : str) -> int:
+        '''Id of the (virtual) thread row with the given name.'''
+        if name not in self.threads:
+            self.threads[name] = tid = len(self.threads)
+            self.queue.put(('M', 'thread_name', 0., 0., tid, {'name' : name}))
+        
+        return self.threads[name]
+    
+    def complete(self, name : str, start : float, stop : float, thread : str = 'main', args : Dict[str, Any] | None = None) -> None:
+        '''A span of work, e.g. the decoding of a frame.'''
+        self.queue.put(('X', name, start, stop - start, self.thread(thread), args))
+    
+    def instant(self, name : str, ts : float, thread : str = 'main', args : Dict[str, Any] | None = None) -> None:
+        '''A point event, e.g. a chord change.'''
+        self.queue.put(('i', name, ts, 0., self.thread(thread), args))
+    
+    def counter(self, name : str, ts : float, values : Dict[str, float]) -> None:
+        '''A set of values tracked over time, e.g. the number of boxes per hand.'''
+        self.queue.put(('C', name, ts, 0., 0, values))
+    
+    def _event(self, item : Tuple) -> Dict[str, Any]:
+        ph, name, ts, dur, tid, args = item
+        
+        event = {'name' : name, 'ph' : ph, 'pid' : self.pid, 'tid' : tid}
+        if ph != 'M': event['ts'] = round((ts - self.origin) * 1e6, 1)
+        if ph == 'X': event['dur'] = round(dur * 1e6, 1)
+        if ph == 'i': event['s'] = 't'
+        if args: event['args'] = args
+        
+        return event
+    
+    def _write(self) -> None:
+        self.file.write('[\n')
+        
+        sep = ''
+        while (item := self.queue.get()) is not None:
+            self.file.write(sep + json.dumps(self._event(item), separators=(',', ':'), default=str))
+            sep = ',\n'
+        
+        self.file.write('\n]\n')
+        self.file.close()
+    
+    def close(self) -> None:
+        '''Flush the pending events and close the trace file.'''
+        self.queue.put(None)
+        self.writer.join()
+    
+    def __enter__(self) -> 'Tracer':
+        return self
+    
+    def __exit__(self, *exc) -> None:
+        self.close()
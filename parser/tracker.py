@@ -0,0 +1,192 @@
+import numpy as np
+from collections import defaultdict
+from dataclasses import dataclass
+
+from typing import Dict, List, Set, Tuple
+
+from .utils import Configs, Box, Layout
+from .music import RawNote, RawChord
+
+@dataclass
+class NoteEvent:
+    '''A tracked note, from the first to the last frame it was detected.'''
+    id    : int
+    hand  : str
+    name  : str
+    onset  : float # Elapsed time (ms) of the first frame the note was detected
+    offset : float # Elapsed time (ms) of the first frame the note was missing
+
+@dataclass
+class Track:
+    id    : int
+    hand  : str
+    name  : str
+    onset : float
+    
+    seen   : int = 1     # Consecutive frames the note was detected
+    missed : int = 0     # Consecutive frames the note was missing
+    active : bool = False
+    offset : float | None = None
+
+class KeyIndex:
+    '''Sorted interval index of the keyboard keys along the x axis, built
+    from the key positions of the layout. White and black keys are indexed
+    separately, within each kind the intervals are disjoint, so both their
+    starts & stops are sorted and the keys overlapping a box are found by
+    binary search.
+    '''
+    def __init__(self, layout : Layout, black_width : float = .6) -> None:
+        white_kb, black_kb = layout.keys
+        white_sp, black_sp = layout.dims
+        
+        half = .5 / len(white_kb)
+        self.kinds = {
+            'white' : (np.asarray(white_sp) - half, np.asarray(white_sp) + half, white_kb),
+            'black' : (np.asarray(black_sp) - black_width * half, np.asarray(black_sp) + black_width * half, black_kb),
+        }
+    
+    def __getitem__(self, box : Box) -> List[str]:
+        '''The keys covered by the box, i.e. the keys whose interval overlaps
+        the box for more than half its width or, if there is none, the key
+        with the largest overlap. Wide boxes of adjacent keys pressed at the
+        same time thus map to all of them.
+        '''
+        # NOTE: We distinguish between black and white keys as Layout does
+        starts, stops, names = self.kinds['black' if box.h < 0.8 else 'white']
+        
+        lo = np.searchsorted(stops,  box.x, side='right')
+        hi = np.searchsorted(starts, box.x + box.w, side='left')
+        if lo >= hi:
+            # The box falls in between keys (or out of the keyboard), take the closest one
+            left, right = max(hi - 1, 0), min(lo, len(names) - 1)
+            return [names[left if box.x - stops[left] < starts[right] - (box.x + box.w) else right]]
+        
+        overlap = np.minimum(stops[lo:hi], box.x + box.w) - np.maximum(starts[lo:hi], box.x)
+        covered = np.flatnonzero(overlap > .5 * (stops[lo:hi] - starts[lo:hi]))
+        
+        if len(covered) == 0: covered = [np.argmax(overlap)]
+        return [names[lo + i] for i in covered]
+
+class NoteTracker:
+    '''Track the notes of each hand across frames with persistent ids. The
+    boxes of each frame are mapped to keys via the interval index, a note
+    starts once it is detected for `appear` consecutive frames and ends once
+    it is missing for `vanish` consecutive ones. Onsets and offsets are dated
+    back to the first frame of the run, so the hysteresis only filters out
+    flickering boxes without delaying the notes.
+    '''
+    def __init__(
+        self,
+        layout : Layout,
+        appear : int = 2,
+        vanish : int = 2,
+    ) -> None:
+        if appear < 1 or vanish < 1:
+            raise ValueError(f'Hysteresis should be at least one frame, got: {appear}, {vanish}')
+        
+        self.index  = KeyIndex(layout)
+        self.appear = appear
+        self.vanish = vanish
+        
+        self.tracks : Dict[Tuple[str, str], Track] = {}
+        self.events : List[NoteEvent] = []
+        self.next_id = 0
+        self.elapsed = 0.
+        self.origin : float | None = None # Elapsed time (ms) of the first frame
+    
+    def update(self, elapsed : float, objs : Dict[str, List[Box]]) -> Set[str]:
+        '''Update the tracks with the boxes detected in a new frame.
+        
+        Returns:
+            Set[str]: The hands whose set of active notes changed.
+        '''
+        self.elapsed = elapsed
+        if self.origin is None: self.origin = elapsed
+        
+        observed = {(hand, name) for hand, boxes in objs.items() for box in boxes for name in self.index[box]}
+        changed = set()
+        
+        for key in sorted(observed):
+            track = self.tracks.get(key)
+            if track is None:
+                hand, name = key
+                track = self.tracks[key] = Track(self.next_id, hand, name, elapsed)
+                self.next_id += 1
+            else:
+                track.seen  += 1
+                track.missed = 0
+                track.offset = None
+            
+            if not track.active and track.seen >= self.appear:
+                track.active = True
+                changed.add(track.hand)
+        
+        for key in sorted(self.tracks.keys() - observed):
+            track = self.tracks[key]
+            
+            # Notes not confirmed yet are just flickering boxes
+            if not track.active:
+                del self.tracks[key]
+                continue
+            
+            track.missed += 1
+            track.seen = 0
+            if track.offset is None: track.offset = elapsed
+            
+            if track.missed >= self.vanish:
+                self.events.append(NoteEvent(track.id, track.hand, track.name, track.onset, track.offset))
+                del self.tracks[key]
+                changed.add(track.hand)
+        
+        return changed
+    
+    def close(self) -> List[NoteEvent]:
+        '''End the notes still active at the last frame and return all the note events.'''
+        for track in self.tracks.values():
+            if not track.active: continue
+            self.events.append(NoteEvent(track.id, track.hand, track.name, track.onset, self.elapsed if track.offset is None else track.offset))
+        
+        self.tracks = {}
+        return sorted(self.events, key=lambda event: (event.onset, event.id))
+
+def chords_from_events(
+    events : List[NoteEvent],
+    configs : Configs = Configs(),
+    hands : List[str] | None = None,
+) -> Dict[str, List[RawChord]]:
+    '''Segment the note events of each hand into chords. A new chord starts
+    at every onset or offset, each chord holds the notes active in between
+    (or a rest). Notes spanning several chords are tied to their continuation
+    in the next chord, which is marked as sustained, so that each note keeps
+    its own duration in the score.
+    Hands are returned in the given order (defaults to the order of the events).
+    '''
+    by_hand : Dict[str, List[NoteEvent]] = defaultdict(list)
+    for event in events: by_hand[event.hand].append(event)
+    
+    chords : Dict[str, List[RawChord]] = defaultdict(list)
+    for hand in hands or list(by_hand):
+        if not (evs := by_hand.get(hand)): continue
+        
+        evs = sorted(evs, key=lambda event: event.onset)
+        bounds = sorted({event.onset for event in evs} | {event.offset for event in evs})
+        
+        active : Dict[int, NoteEvent] = {}
+        prev : Set[int] = set()
+        i = 0
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            while i < len(evs) and evs[i].onset <= start:
+                active[evs[i].id] = evs[i]
+                i += 1
+            
+            for idx in [idx for idx, event in active.items() if event.offset <= start]: del active[idx]
+            
+            notes = {
+                RawNote(event.name, stop - start, sustained=idx in prev, start_tie=event.offset > stop)
+                for idx, event in active.items()
+            } or 'R'
+            
+            chords[hand].append(RawChord(notes, configs, time=stop - start, elapsed=start))
+            prev = set(active)
+    
+    return chords
@@ -1,11 +1,12 @@
 import numpy as np
 import colorsys as cs
 
-from PIL import Image
-from abjad import Container, Duration, Note
-from typing import Literal, Tuple
+from typing import Literal, Tuple, TYPE_CHECKING
 from dataclasses import dataclass
-from abjad.get import leaf
+
+if TYPE_CHECKING:
+    from PIL import Image
+    from abjad import Container, Duration, Note
 
 Notes = Literal[
     'A', 'B', 'C', 'D', 'E', 'F', 'G',
@@ -76,8 +77,12 @@ class Box:
     y : int | float
     w : int | float
     h : int | float
-    pos_thr : float = 40
-    dim_thr : float = 40
+    
+    # NOTE: Thresholds are expressed in normalized units, i.e. x & w as a fraction
+    #       of the frame width and y & h of its height: ~40px along the width of
+    #       a 1920px wide frame, ~5px along the height of a 250px tall strip
+    pos_thr : float = 2e-2
+    dim_thr : float = 2e-2
     
     def __eq__(self, box : 'Box') -> bool:
         if not isinstance(box, Box): return False
@@ -96,21 +101,25 @@ class Box:
     
     def __truediv__(self, other: Tuple[float, float]) -> 'Box':
         w, h = other
-        return Box(self.x / w, self.y / h, self.w / w, self.h / h, self.pos_thr / max(h, w), self.dim_thr / max(h, w))
+        return Box(self.x / w, self.y / h, self.w / w, self.h / h, self.pos_thr, self.dim_thr)
 
 
 def get_leaf(
-    voice : Container,
+    voice : 'Container',
     which : Literal['prev', 'curr', 'next'] = 'curr'
-) -> Note:
+) -> 'Note':
+    from abjad.get import leaf
+    
     match which:
         case 'prev': return leaf(voice, n=-1)
         case 'curr': return leaf(voice, n=+0)
         case 'next': return leaf(voice, n=+1)
 
-def to_ms(duration : Duration, info : Configs) -> float:
+def to_ms(duration : 'Duration', info : Configs) -> float:
     n, d = duration.pair
     return (n / d) * (info.MIN_UNIT / (info.BPM * info.BPM_UNIT)) * info.SEC_IN_MIN * info.MS_IN_SEC
 
-def frame_to_pil(frame : np.ndarray) -> Image.Image:
+def frame_to_pil(frame : np.ndarray) -> 'Image.Image':
+    from PIL import Image
+    
     return Image.fromarray(frame)
\ No newline at end of file
@@ -1,16 +1,22 @@
 import cv2
+import time
 import numpy as np
-from itertools import combinations
 from collections import defaultdict
 
 from tqdm.auto import trange
 from dataclasses import dataclass
 from PIL import Image, ImageEnhance
-from typing import List, Tuple, Dict
+from typing import Callable, List, Tuple, Dict
 
 from .utils import Configs, Color, Box, Layout
 from .utils import BLACK, WHITE
-from .music import RawChord
+from .roll import PianoRoll
+from .music import RawChord, align_hands
+from .checkpoint import Checkpoint
+from .tracker import NoteTracker, chords_from_events
+from .trace import Tracer
+from .dedup import SegmentIndex
+from .source import Source, open_source
 
 @dataclass
 class Frame:
@@ -52,31 +58,71 @@ class Frame:
         
         return np.asarray(img)
 
+def to_frame(
+    image : np.ndarray,
+    elapsed : float,
+    trim_areas : Tuple[slice, slice],
+    palette : List[Color],
+    scale : float = 1.,
+    rgb : bool = False,
+) -> Frame:
+    '''Trim the raw BGR (or RGB) video frame to the keyboard strip and
+    optionally downscale it before detection. Note bars are hundreds of
+    pixels wide, so detecting on a downsampled strip is much cheaper with
+    no loss of accuracy, given that all the detection thresholds are normalized.
+    '''
+    image = image[trim_areas]
+    if scale != 1.:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    
+    return Frame(
+        image if rgb else cv2.cvtColor(image, cv2.COLOR_BGR2RGB),
+        elapsed,
+        palette=palette,
+    )
+
 def find_objs(
     frame : Frame,
     obj_col : Dict[str, Color],
     hue_span : int = 10,
-    min_area : int = 750,
+    min_area : float = 1.5e-3,
+    quantize : bool = True,
 ) -> Dict[str, List[Box]]:
+    '''Detect the colored note bars in the frame, grouped by hand.
+    
+    Args:
+        frame (Frame): The (trimmed and possibly downscaled) frame to inspect.
+        obj_col (Dict[str, Color]): The hand :> note color mapping.
+        hue_span (int, optional): Hue tolerance around the target color. Defaults to 10.
+        min_area (float, optional): Minimum contour area, as a fraction of the
+            frame area (~750px on a 1920x250 strip). Defaults to 1.5e-3.
+        quantize (bool, optional): Quantize the frame to its palette first, which is
+            more robust to shading but several times slower. Defaults to True.
+    
+    Returns:
+        Dict[str, List[Box]]: The sorted normalized boxes detected for each hand.
+    '''
     if isinstance(obj_col, Color): obj_col = [obj_col]
     
+    # Quantize once, the HSV image is shared by all the target colors
+    hsv = cv2.cvtColor(frame.quantized if quantize else frame.image, cv2.COLOR_RGB2HSV)
+    h, w, *_ = frame.shape
+    
     objs = defaultdict(list)
     for key, col in obj_col.items():
         # Create a mask to extract the target color from the frame
         hue_start = col.hue - hue_span
         hue_stop  = col.hue + hue_span
-        hsv = cv2.cvtColor(frame.quantized, cv2.COLOR_RGB2HSV)
         mask = cv2.inRange(hsv, (hue_start, 50, 50), (hue_stop, 255, 255))
-    
+        
         # Get the contours of the objects in the mask
         contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         
         # Filter out the contours that are too small
-        h, w, *_ = frame.shape
         box = sorted([
             Box(*cv2.boundingRect(contour)) / (w, h)
             for contour in contours
-            if cv2.contourArea(contour) > min_area
+            if cv2.contourArea(contour) > min_area * w * h
         ])
         
         # Only fill the dictionary if there are
@@ -87,14 +133,25 @@ def find_objs(
     return objs
 
 def extract_notes(
-    video_path : str,
+    video_path : str | Source,
     key_layout : Layout,
     note_color : Dict[str, Color],
     skip_intro : int | None = None,
     skip_outro : int | None = None,
     early_stop : int | None = None,
     trim_areas : Tuple[slice, slice] = (slice(-250, None), slice(None, None)),
+    detect_scale : float = 1.,
     configs : Configs = Configs(),
+    tracking : bool = False,
+    hysteresis : Tuple[int, int] = (2, 2),
+    checkpoint : str | None = None,
+    checkpoint_every : int | None = None,
+    checkpoint_secs  : float | None = None,
+    resume  : bool = False,
+    dump_roll : str | None = None,
+    dedup_window : int | None = None,
+    trace : str | None = None,
+    progress : Callable[[int, int], None] | None = None,
     verbose : bool = True,
 ) -> Tuple[
     Dict[str, List[RawChord]],
@@ -104,128 +161,419 @@ def extract_notes(
     '''Divide the video frames into chunks, where the split
     is decided by the color difference between the current frame
     and the target color.
-
+    
     Args:
-        video_path (str): The path to the video file.
+        video_path (str | Source): The path to the video file, frame directory or
+            raw frames file (see `open_source`), or an already opened frame source (which
+            is owned, and thus closed, by the caller).
         targ_color (Color): The target color used to split the video frames into chunks.
         divide_thr (float, optional): The threshold value for color difference. Defaults to 1e-3.
         skip_intro (int, optional): Number of intro frames to skip. Defaults to None.
-
+        detect_scale (float, optional): Downscale factor applied to the trimmed
+            strip before detection. Defaults to 1. (full resolution).
+        tracking (bool, optional): Track the notes across frames (see `NoteTracker`) instead
+            of comparing the sorted boxes of consecutive frames. Defaults to False.
+        hysteresis (Tuple[int, int], optional): Number of consecutive frames for a tracked
+            note to appear & to vanish. Defaults to (2, 2).
+        checkpoint (str, optional): Path of the checkpoint file. Defaults to None (no checkpoints).
+        checkpoint_every (int, optional): Store a checkpoint every N frames. Defaults to None.
+        checkpoint_secs (float, optional): Store a checkpoint every N seconds. Defaults to None.
+        resume (bool, optional): Resume the extraction from the checkpoint. Defaults to False.
+        dump_roll (str, optional): Path prefix of the per-frame piano roll to dump, not
+            available while tracking. Defaults to None.
+        dedup_window (int, optional): Length (frames) of the fingerprint window used to spot
+            repeated passages (see `SegmentIndex`), whose chords are then predicted from their
+            earlier occurrence: the predicted frames are still decoded, but most of them only
+            go through the cheap detection to confirm the prediction. Defaults to None.
+        trace (str, optional): Path of the Chrome trace of the per-frame decode & detection
+            latency, boxes per hand and chord changes (see `Tracer`). Defaults to None.
+        progress (Callable[[int, int], None], optional): Callback receiving the number of
+            processed frames and the total after every frame. Defaults to None.
+    
     Returns:
         List[Frame]: A list of frames representing the divided chunks of the video.
     '''
     
+    if not 0 < detect_scale <= 1:
+        raise ValueError(f'Detection scale should be in (0, 1], got: {detect_scale}')
+    
     palette = [
         WHITE, BLACK, *list(note_color.values())
     ]
     
-    # Load the video & check correct opening
-    capture = cv2.VideoCapture(video_path)
-    if not capture.isOpened():
-        raise ValueError(f'Could not open video file: {video_path}')
-    
-    # Get all the available metadata from the video
-    fps = capture.get(cv2.CAP_PROP_FPS)
-    frame_count  = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
-    frame_width  = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
-    frame_height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    
-    skip_intro = skip_intro or 0
-    skip_outro = skip_outro or 0
-    early_stop = early_stop or (frame_count - skip_outro)
-    
-    # Skip the intro frames if necessary
-    while skip_intro:
-        ret, frame = capture.read()
-        skip_intro -= 1
-    
-    # Skip till first note is detected
-    while not (old_objs := find_objs(
-                last := Frame(
-                    cv2.cvtColor(frame[trim_areas], cv2.COLOR_BGR2RGB),
-                    capture.get(cv2.CAP_PROP_POS_MSEC),
-                    palette=palette,
-                ),
-                note_color,    
-            )):
-        ret, frame = capture.read()
-    
-    # * Main loop to divide the video into chunks
-    chords : Dict[str, List[RawChord]] = defaultdict(list)
-    frames : Dict[str, List[Frame]]    = defaultdict(list)
-    _frame : Dict[str, Frame] = {k : last for k in old_objs}
-    for k, v in old_objs.items():
-        chords[k].append(RawChord(
-            key_layout[v],
-            configs,
-        ))
-        frames[k].append(last)
-    
-    num_frames = 0
-    feedback = trange(0, early_stop, desc='Parsing Video') if verbose else None
-    while ret and num_frames < early_stop:
-        ret, frame = capture.read()
-        if not ret: break
-        
-        frame = Frame(
-            cv2.cvtColor(frame[trim_areas], cv2.COLOR_BGR2RGB),
-            capture.get(cv2.CAP_PROP_POS_MSEC),
-            palette=palette,
-        )
-        
-        new_objs = find_objs(
-            frame,
-            note_color,
-        )
-        
-        for key in note_color:
-            # If the number of objects of the target color
-            # changes we mark this frame as important
-            if old_objs[key] != new_objs[key]:
-                boxes = new_objs[key]
+    if resume and not checkpoint:
+        raise ValueError('Cannot resume an extraction without a checkpoint path')
+    
+    if dedup_window and tracking:
+        raise ValueError('Repeated passages cannot be reused while tracking the notes')
+    
+    # NOTE: Tracked chords are dated back once their notes end, not segmented
+    #       at the frames where the tracker confirms a change
+    if dump_roll and tracking:
+        raise ValueError('The piano roll cannot replay the chords of tracked notes')
+    
+    # Load the video (or the frame sequence) & get all the available metadata,
+    # only the sources opened here are closed here (others are caller-owned)
+    owned  = isinstance(video_path, str)
+    source = None
+    tracer = None
+    try:
+        source = open_source(video_path) if owned else video_path
+        
+        fps = source.fps
+        frame_count  = source.frame_count
+        frame_width  = source.width
+        frame_height = source.height
+        
+        skip_intro = skip_intro or 0
+        skip_outro = skip_outro or 0
+        early_stop = early_stop or (frame_count - skip_outro)
+        
+        meta = {
+            'video_fps' : fps,
+            'video_frame_count' : frame_count,
+            'video_frame_width' : frame_width,
+            'video_frame_height' : frame_height,
+        }
+        
+        # Optionally dump the active keys of every frame to a piano roll
+        roll = None
+        if dump_roll and resume: roll = PianoRoll.open(dump_roll, mode='r+')
+        elif dump_roll:
+            white_kb, black_kb = key_layout.keys
+            roll = PianoRoll.create(
+                dump_roll,
+                early_stop + 1,
+                [*white_kb, *black_kb],
+                list(note_color),
+                meta=meta,
+            )
+        
+        def keep(key : str, frame : Frame) -> None:
+            # Store a change frame of the hand (only its timing is checkpointed)
+            frames[key].append(frame)
+            notes_onset.setdefault(key, frame.elapsed)
+            notes_offset[key] = frame.elapsed
+            num_changes[key] += 1
+        
+        if resume:
+            # Restore the state of the main loop & seek the video back
+            ckpt = Checkpoint.load(checkpoint)
+            source.seek(ckpt.position)
+            
+            chords, frames = ckpt.chords, defaultdict(list)
+            _elapsed, old_objs = ckpt.last, ckpt.old_objs
+            notes_onset, notes_offset, num_changes = ckpt.onset, ckpt.offset, ckpt.changes
+            tracker = ckpt.tracker
+            num_frames = ckpt.num_frames
+            ret = True
+        
+        else:
+            # Skip the intro frames if necessary
+            ret, frame, elapsed = source.read()
+            while ret and skip_intro:
+                ret, frame, elapsed = source.read()
+                skip_intro -= 1
+            
+            # Skip till first note is detected
+            while ret and not (old_objs := find_objs(
+                        last := to_frame(
+                            frame,
+                            elapsed,
+                            trim_areas,
+                            palette,
+                            scale=detect_scale,
+                            rgb=source.rgb,
+                        ),
+                        note_color,    
+                    )):
+                ret, frame, elapsed = source.read()
+            
+            if not ret: raise ValueError(f'No notes detected in video file: {video_path}')
+            
+            # * Main loop to divide the video into chunks
+            chords : Dict[str, List[RawChord]] = defaultdict(list)
+            frames : Dict[str, List[Frame]]    = defaultdict(list)
+            _elapsed : Dict[str, float] = {k : last.elapsed for k in old_objs}
+            
+            # Elapsed time of the first & last change, and number of changes of
+            # each hand, kept apart from the change frames which are not checkpointed
+            notes_onset  : Dict[str, float] = {}
+            notes_offset : Dict[str, float] = {}
+            num_changes  : Dict[str, int]   = defaultdict(int)
+            
+            tracker = NoteTracker(key_layout, *hysteresis) if tracking else None
+            if tracker is not None:
+                for k in tracker.update(last.elapsed, old_objs): keep(k, last)
+            
+            else:
+                for k, v in old_objs.items():
+                    chords[k].append(RawChord(
+                        key_layout[v],
+                        configs,
+                    ))
+                    keep(k, last)
+            
+            if roll is not None: roll.record(0, last.elapsed, {k : key_layout[v] for k, v in old_objs.items()}, list(old_objs))
+            
+            num_frames = 0
+        
+        def save_checkpoint() -> None:
+            if roll is not None: roll.flush(num_frames + 1)
+            Checkpoint(
+                position   = origin + num_frames,
+                num_frames = num_frames,
+                old_objs = old_objs,
+                last     = _elapsed,
+                chords   = chords,
+                onset    = notes_onset,
+                offset   = notes_offset,
+                changes  = num_changes,
+                tracker  = tracker,
+            ).save(checkpoint)
+        
+        tracer = Tracer(trace) if trace else None
+        
+        # The position of the next frame is always `origin + num_frames`, also
+        # when frames are reused rather than decoded
+        origin = source.position - num_frames
+        
+        # Optionally index the frames signatures to spot repeated passages. The
+        # history is kept per frame of this run: the elapsed time, the signature
+        # (i.e. the active keys) and the hands changing chord at each frame
+        index = SegmentIndex(dedup_window) if dedup_window else None
+        times   : List[float] = []
+        changes : Dict[int, List[str]] = defaultdict(list)
+        base = num_frames + 1 # Roll row of the first frame of the history
+        
+        def signature(objs : Dict[str, List[Box]]) -> Tuple[Tuple[str, ...], ...]:
+            return tuple(tuple(key_layout[objs[key]]) for key in note_color)
+        
+        def change(key : str, boxes : List[Box], frame : Frame) -> None:
+            # Mark timing for previous chords as we got a new one
+            if chords[key]:
+                for notes in chords[key][-1]._notes:
+                    notes.time = frame.elapsed - _elapsed[key]
+            
+            # Add chords and frames to the respective lists
+            chords[key].append(RawChord(
+                key_layout[boxes],
+                configs,
+                elapsed=frame.elapsed,
+            ))
+            
+            keep(key, frame)
+            if index is not None: changes[len(times) - 1].append(key)
+            
+            # Update the last change time and objects
+            _elapsed[key] = frame.elapsed
+            old_objs[key] = boxes
+        
+        def verify(match : int, skip : int) -> Tuple[
+            List[float],
+            Dict[int, Tuple[Frame, Dict[str, List[Box]]]],
+        ] | None:
+            # Every predicted frame is decoded & checked against its earlier
+            # occurrence, so that no variation of the repeat is missed. The
+            # frames around each predicted change go through the full detection
+            # and must change chord exactly as the main loop would (i.e. on the
+            # boxes, not only the keys), so every chord boundary is confirmed to
+            # the frame. The other frames only go through the cheap detection
+            # (no quantization) compared at the key level: a box moving without
+            # its keys changing is caught at the next checked frame, unless it
+            # moves back in between. The landing frame is handed to the main loop
+            checks = {skip + 1}
+            for idx in range(match + 1, match + skip + 1):
+                if idx in changes: checks |= {idx - match - 1, idx - match}
+            
+            boxes = defaultdict(list, old_objs)
+            elapsed  : List[float] = []
+            detected : Dict[int, Tuple[Frame, Dict[str, List[Box]]]] = {}
+            for k in range(1, skip + 2):
+                ret, image, now = source.read()
+                if not ret: return None
+                
+                frame = to_frame(image, now, trim_areas, palette, scale=detect_scale, rgb=source.rgb)
+                elapsed.append(frame.elapsed)
+                if k > skip: detected[k] = frame, find_objs(frame, note_color)
+                
+                elif k in checks:
+                    objs = find_objs(frame, note_color)
+                    if signature(objs) != index[match + k]: return None
+                    
+                    changed = [key for key in note_color if boxes[key] != objs[key]]
+                    if changed != changes.get(match + k, []): return None
+                    
+                    for key in changed: boxes[key] = objs[key]
+                    if changed: detected[k] = frame, objs
+                
+                elif signature(find_objs(frame, note_color, quantize=False)) != index[match + k]: return None
+            
+            return elapsed, detected
+        
+        def reuse(
+            match : int,
+            skip : int,
+            elapsed : List[float],
+            detected : Dict[int, Tuple[Frame, Dict[str, List[Box]]]],
+        ) -> None:
+            # Replay the chord changes following the matched window onto the
+            # verified frames, with their own timing & boxes
+            nonlocal num_frames
+            
+            for k, idx in enumerate(range(match + 1, match + skip + 1), 1):
+                times.append(elapsed[k - 1])
+                index.push(index[idx])
+                
+                for key in changes.get(idx, []):
+                    frame, objs = detected[k]
+                    change(key, objs[key], frame)
                 
-                # Mark timing for previous chords as we got a new one
-                if chords[key]:
-                    prev, post = _frame[key], frame
-                    for notes in chords[key][-1]._notes:
-                        notes.time = post.elapsed - prev.elapsed
+                if roll is not None:
+                    roll.roll[num_frames + 1] = roll.roll[base + idx]
+                    roll.time[num_frames + 1] = times[-1]
+                    if roll.change is not None: roll.change[num_frames + 1] = roll.change[base + idx]
                 
-                # Add chords and frames to the respective lists
-                chords[key].append(RawChord(
-                    key_layout[boxes],
-                    configs,
-                    elapsed=frame.elapsed,
-                ))
+                num_frames += 1
+            
+            if feedback: feedback.update(skip)
+            if progress: progress(num_frames, early_stop)
+        
+        # Reused frames advance `num_frames` by more than one at once, hence
+        # the frame count of the last save rather than a modulo
+        last_save  = time.monotonic()
+        last_saved = num_frames
+        cooldown = 0
+        pending = None
+        feedback = trange(0, early_stop, initial=num_frames, desc='Parsing Video') if verbose else None
+        try:
+            while ret and num_frames < early_stop:
+                t0 = time.perf_counter()
+                
+                # The frame may have already been decoded to verify a repeat
+                if pending is not None: (frame, new_objs), pending = pending, None
+                else:
+                    ret, frame, elapsed = source.read()
+                    if not ret: break
+                    
+                    t1 = time.perf_counter()
+                    frame = to_frame(
+                        frame,
+                        elapsed,
+                        trim_areas,
+                        palette,
+                        scale=detect_scale,
+                        rgb=source.rgb,
+                    )
+                    
+                    new_objs = find_objs(
+                        frame,
+                        note_color,
+                    )
+                    
+                    if tracer is not None:
+                        tracer.complete('decode', t0, t1, args={'frame' : num_frames + 1})
+                        tracer.complete('detect', t1, time.perf_counter(), args={'frame' : num_frames + 1, 'elapsed' : frame.elapsed})
+                
+                t2 = time.perf_counter()
+                if tracer is not None: tracer.counter('boxes', t2, {k : len(new_objs[k]) for k in note_color})
+                
+                match = None
+                if index is not None:
+                    times.append(frame.elapsed)
+                    match = index.push(signature(new_objs))
+                
+                changed = []
+                if tracker is not None:
+                    # Persistent note tracks replace the comparison of the sorted boxes
+                    for key in tracker.update(frame.elapsed, new_objs):
+                        keep(key, frame)
+                        if tracer is not None: tracer.instant('change', t2, thread=key, args={'elapsed' : frame.elapsed})
+                
+                else:
+                    for key in note_color:
+                        # If the number of objects of the target color
+                        # changes we mark this frame as important
+                        if old_objs[key] != new_objs[key]:
+                            change(key, new_objs[key], frame)
+                            changed.append(key)
+                            if tracer is not None: tracer.instant('change', t2, thread=key, args={'elapsed' : frame.elapsed, 'notes' : key_layout[new_objs[key]]})
+                
+                if roll is not None: roll.record(num_frames + 1, frame.elapsed, {k : key_layout[v] for k, v in new_objs.items()}, changed)
                 
-                frames[key].append(frame)
+                num_frames += 1
+                if feedback: feedback.update(1)
+                if progress: progress(num_frames, early_stop)
                 
-                # Update the last frame and objects
-                _frame[key] = frame
-                old_objs[key] = new_objs[key]
+                # A repeated passage was found: predict the next frames from the
+                # ones following its earlier occurrence & reuse them, once the
+                # prediction is verified where it matters (see `verify`)
+                cooldown = max(cooldown - 1, 0)
+                skip = 0 if match is None or cooldown else min(dedup_window, len(times) - 1 - match, early_stop - num_frames) - 1
+                if skip > 0:
+                    position = source.position
+                    if (verified := verify(match, skip)) is not None:
+                        elapsed, detected = verified
+                        reuse(match, skip, elapsed, detected)
+                        pending = detected[skip + 1]
+                    
+                    else:
+                        # Mispredicted, go back to decoding the frames one by one
+                        source.seek(position)
+                        cooldown = dedup_window
+                    
+                    if tracer is not None: tracer.complete('reuse' if pending else 'verify', t2, time.perf_counter(), args={'skip' : skip})
+                
+                # Periodically store the extraction state to disk
+                if checkpoint and (
+                    (checkpoint_every and num_frames - last_saved >= checkpoint_every) or
+                    (checkpoint_secs  and time.monotonic() - last_save > checkpoint_secs)
+                ):
+                    save_checkpoint()
+                    last_save  = time.monotonic()
+                    last_saved = num_frames
+        
+        except KeyboardInterrupt:
+            # Store progress before leaving so the run can be resumed
+            if checkpoint: save_checkpoint()
+            raise
+    
+    finally:
+        if owned and source is not None: source.close()
+        if tracer is not None: tracer.close()
+    
+    if tracker is not None:
+        # Segment the tracked notes into chords, now that all of them have ended
+        events = tracker.close()
+        if not events: raise ValueError(f'No notes detected in video file: {video_path}')
+        
+        notes_onset, notes_offset = {}, {}
+        for event in events:
+            notes_onset [event.hand] = min(notes_onset .get(event.hand, event.onset ), event.onset )
+            notes_offset[event.hand] = max(notes_offset.get(event.hand, event.offset), event.offset)
         
-        num_frames += 1
-        if feedback: feedback.update(1)
+        # As in the main loop, hands are sorted by their first note, and the
+        # chords playing since the first frame are initial ones
+        hands = sorted(notes_onset, key=lambda k: (notes_onset[k], list(note_color).index(k)))
+        chords = chords_from_events(events, configs, hands=hands)
+        for track in chords.values():
+            if track[0].elapsed == tracker.origin: track[0].elapsed = 0
     
     info = {
-        'video_fps' : fps,
-        'video_frame_count' : frame_count,
-        'video_frame_width' : frame_width,
-        'video_frame_height' : frame_height,
+        **meta,
         'video_fraction' : num_frames / frame_count,
-        'notes_onset'  : {k : v[ 0].elapsed for k, v in frames.items()},
-        'notes_offset' : {k : v[-1].elapsed for k, v in frames.items()},
+        'notes_onset'  : notes_onset,
+        'notes_offset' : notes_offset,
         'detected_chords' : {k : len(v) for k, v in chords.items()},
+        'detected_frames' : dict(num_changes),
     }
     
     # If there is a difference in onset/offset times, we
     # need to align them by inserting rests when appropriate
-    keys = chords.keys()
-    for key1, key2 in combinations(keys, 2):
-        if abs(diff := info['notes_onset'][key1] - info['notes_onset'][key2]) > 2 * info['video_fps']:
-            if diff < 0: chords[key2].insert(0, RawChord('R', time=abs(diff), info=configs))
-            else:        chords[key1].insert(0, RawChord('R', time=abs(diff), info=configs))
-        if abs(diff := info['notes_offset'][key1] - info['notes_offset'][key2]) > 2 * info['video_fps']:
-            if diff < 0: chords[key2].append(RawChord('R', time=abs(diff), info=configs))
-            else:        chords[key1].append(RawChord('R', time=abs(diff), info=configs))
+    chords = align_hands(chords, info, configs)
+    
+    if roll is not None:
+        roll.meta['video_fraction'] = info['video_fraction']
+        roll.flush(num_frames + 1)
     
     return chords, info, frames
@@ -0,0 +1,344 @@
+from argparse import ArgumentParser
+from argparse import Namespace
+import os
+import json
+import time
+import uuid
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from multiprocessing import Manager
+from urllib.parse import urlsplit
+
+from typing import Any, Callable, Dict, List, Set, Tuple
+
+import parse
+from parser.music import RawChord
+from parser.utils import Layout, get_layout
+
+REASONS = {
+    200 : 'OK',
+    202 : 'Accepted',
+    400 : 'Bad Request',
+    404 : 'Not Found',
+    500 : 'Internal Server Error',
+}
+
+# Minimum interval (in seconds) between two progress updates of a job
+PROGRESS_INTERVAL = .5
+
+# Layouts are cached in each worker process, keyed by the keyboard settings
+_LAYOUTS : Dict[Tuple, Layout] = {}
+
+def _warm() -> None:
+    '''Import the heavy modules once per worker, ahead of the first job.'''
+    import abjad, cv2
+
+def _layout(args : Namespace) -> Layout:
+    config = parse.get_configs(args)
+    key = (config.num_octaves, config.start_octave, config.first_note, config.last_note, config.notation)
+    if key not in _LAYOUTS: _LAYOUTS[key] = get_layout(config)
+    
+    return _LAYOUTS[key]
+
+def _extract(
+    job_id : str,
+    args : Namespace,
+    events : Any,
+) -> Tuple[
+    Dict[str, List[RawChord]],
+    Dict[str, Any],
+]:
+    events.put((job_id, 'extracting', 0, 0))
+    
+    last = 0.
+    def progress(done : int, total : int) -> None:
+        # Throttle the updates, the queue is shared by all the workers
+        nonlocal last
+        if (now := time.monotonic()) - last > PROGRESS_INTERVAL or done == total:
+            events.put((job_id, 'extracting', done, total))
+            last = now
+    
+    return parse.extract(args, layout=_layout(args), progress=progress)
+
+def _render(
+    job_id : str,
+    music : Dict[str, List[RawChord]],
+    args : Namespace,
+    events : Any,
+) -> List[str]:
+    events.put((job_id, 'rendering', 0, 0))
+    
+    parse.render(music, args)
+    
+    # Only files are artifacts, not the directories (e.g. the section cache)
+    return sorted(name for name in os.listdir(args.out_dir) if os.path.isfile(os.path.join(args.out_dir, name)))
+
+def to_argv(path : str, options : Dict[str, Any] | List[str]) -> List[str]:
+    '''Convert the job options into the `parse.py` command line. Options
+    can either be given as a raw list of arguments or as a dictionary.
+    '''
+    if isinstance(options, list): return ['full', path, *map(str, options)]
+    
+    argv = ['full', path]
+    defaults = vars(parse.parse_args(argv))
+    for key, value in options.items():
+        flag = f'--{key}'
+        match value:
+            case None : pass
+            case True : argv.append(flag)
+            case False: argv += [f'--no-{key}'] if defaults.get(key) is True else []
+            case list() | tuple(): argv += [flag, *map(str, value)]
+            case dict(): argv += [flag, json.dumps(value)]
+            case _: argv += [flag, str(value)]
+    
+    return argv
+
+@dataclass
+class Job:
+    id   : str
+    args : Namespace
+    
+    status : str = 'queued'
+    done   : int = 0
+    total  : int = 0
+    error  : str | None = None
+    info   : Dict[str, Any] = field(default_factory=dict)
+    artifacts : List[str] = field(default_factory=list)
+    
+    # Event set (and replaced) at every update of the job
+    changed : asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+    
+    @property
+    def finished(self) -> bool:
+        return self.status in ('done', 'failed')
+    
+    @property
+    def state(self) -> Dict[str, Any]:
+        return {
+            'id'     : self.id,
+            'path'   : self.args.path,
+            'status' : self.status,
+            'done'   : self.done,
+            'total'  : self.total,
+            'error'  : self.error,
+            'info'   : self.info,
+            'artifacts' : self.artifacts,
+        }
+    
+    def update(self, status : str, done : int | None = None, total : int | None = None) -> None:
+        if self.finished: return
+        
+        self.status = status
+        if done  is not None: self.done  = done
+        if total is not None: self.total = total
+        
+        # Wake up the streams waiting for news & arm a new event
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+class Service:
+    '''Local transcription service: keeps the heavy modules (abjad, cv2)
+    and the keyboard layouts warm in two bounded pools of processes, one
+    for the extraction of the notes and one for the rendering of the score,
+    so that throughput is bound by the cores rather than by start-up costs.
+    
+    Routes:
+        - POST /jobs                        : Submit a job {"path" : ..., "options" : {...}}
+        - GET  /jobs                        : Status of all the jobs
+        - GET  /jobs/<id>                   : Status of the job
+        - GET  /jobs/<id>/events            : Stream of the job progress (one JSON per line)
+        - GET  /jobs/<id>/artifacts/<name>  : Download a rendered artifact
+    '''
+    def __init__(
+        self,
+        root : str,
+        extract_workers : int | None = None,
+        render_workers  : int | None = None,
+    ) -> None:
+        self.root = root
+        self.jobs : Dict[str, Job] = {}
+        
+        # Running jobs, referenced until done so they are never garbage-collected
+        self.tasks : Set[asyncio.Task] = set()
+        
+        self.manager = Manager()
+        self.events  = self.manager.Queue()
+        
+        self.workers = {'extract' : extract_workers, 'render' : render_workers}
+        self.pools = {
+            stage : ProcessPoolExecutor(workers, initializer=_warm)
+            for stage, workers in self.workers.items()
+        }
+    
+    def submit(self, payload : Dict[str, Any]) -> Job:
+        argv = to_argv(payload['path'], payload.get('options', {}))
+        
+        try: args = parse.parse_args(argv)
+        except SystemExit: raise ValueError(f'Invalid job options: {argv}')
+        
+        job = Job(uuid.uuid4().hex, args)
+        
+        # Each job renders in its own directory, never opens the result
+        # and keeps the tqdm feedback out of the worker processes
+        args.out_dir = os.path.join(self.root, job.id)
+        args.open, args.verbose = False, False
+        os.makedirs(args.out_dir, exist_ok=True)
+        
+        self.jobs[job.id] = job
+        task = asyncio.create_task(self.run(job))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        
+        return job
+    
+    async def execute(self, stage : str, fn : Callable, *args : Any) -> Any:
+        '''Run the function in the pool of the stage. A worker dying abruptly
+        (e.g. killed by the OOM killer) breaks the whole pool: it is replaced
+        by a fresh one, so that only the jobs it was running fail.
+        '''
+        pool = self.pools[stage]
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+        except BrokenProcessPool:
+            # The other jobs of the broken pool may have replaced it already
+            if self.pools[stage] is pool:
+                pool.shutdown(wait=False, cancel_futures=True)
+                self.pools[stage] = ProcessPoolExecutor(self.workers[stage], initializer=_warm)
+            raise
+    
+    async def run(self, job : Job) -> None:
+        try:
+            music, job.info = await self.execute('extract', _extract, job.id, job.args, self.events)
+            job.artifacts   = await self.execute('render',  _render,  job.id, music, job.args, self.events)
+            job.update('done')
+        except Exception as err:
+            job.error = repr(err)
+            job.update('failed')
+    
+    async def pump(self) -> None:
+        '''Forward the progress sent by the workers to the jobs.'''
+        loop = asyncio.get_running_loop()
+        while (event := await loop.run_in_executor(None, self.events.get)) is not None:
+            job_id, status, done, total = event
+            if job := self.jobs.get(job_id): job.update(status, done, total)
+    
+    async def handle(
+        self,
+        reader : asyncio.StreamReader,
+        writer : asyncio.StreamWriter,
+    ) -> None:
+        try:
+            method, target, _ = (await reader.readline()).decode().split()
+            
+            headers = {}
+            while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                key, value = line.decode().split(':', 1)
+                headers[key.strip().lower()] = value.strip()
+            
+            body = await reader.readexactly(int(headers.get('content-length', 0)))
+            
+            await self.route(method, urlsplit(target).path, body, writer)
+        except Exception as err:
+            await self.respond(writer, 500, {'error' : repr(err)})
+        finally:
+            writer.close()
+    
+    async def route(
+        self,
+        method : str,
+        path : str,
+        body : bytes,
+        writer : asyncio.StreamWriter,
+    ) -> None:
+        parts = [part for part in path.split('/') if part]
+        
+        match method, parts:
+            case 'POST', ['jobs']:
+                try: job = self.submit(json.loads(body))
+                except (ValueError, KeyError) as err:
+                    return await self.respond(writer, 400, {'error' : str(err)})
+                await self.respond(writer, 202, job.state)
+            
+            case 'GET', ['jobs']:
+                await self.respond(writer, 200, [job.state for job in self.jobs.values()])
+            
+            case 'GET', ['jobs', job_id] if job_id in self.jobs:
+                await self.respond(writer, 200, self.jobs[job_id].state)
+            
+            case 'GET', ['jobs', job_id, 'events'] if job_id in self.jobs:
+                await self.stream(writer, self.jobs[job_id])
+            
+            case 'GET', ['jobs', job_id, 'artifacts', name] if job_id in self.jobs and name in self.jobs[job_id].artifacts and\
+                os.path.isfile(path := os.path.join(self.jobs[job_id].args.out_dir, name)):
+                with open(path, 'rb') as f:
+                    await self.respond(writer, 200, f.read(), content_type='application/octet-stream')
+            
+            case _:
+                await self.respond(writer, 404, {'error' : f'Not found: {method} {path}'})
+    
+    async def respond(
+        self,
+        writer : asyncio.StreamWriter,
+        status : int,
+        payload : Any,
+        content_type : str = 'application/json',
+    ) -> None:
+        body = payload if isinstance(payload, bytes) else json.dumps(payload, default=float).encode()
+        
+        writer.write(
+            f'HTTP/1.1 {status} {REASONS[status]}\r\n'
+            f'Content-Type: {content_type}\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            f'Connection: close\r\n\r\n'.encode() + body
+        )
+        await writer.drain()
+    
+    async def stream(self, writer : asyncio.StreamWriter, job : Job) -> None:
+        writer.write(
+            f'HTTP/1.1 200 OK\r\n'
+            f'Content-Type: application/x-ndjson\r\n'
+            f'Connection: close\r\n\r\n'.encode()
+        )
+        
+        while True:
+            changed = job.changed
+            writer.write(json.dumps(job.state, default=float).encode() + b'\n')
+            await writer.drain()
+            
+            if job.finished: break
+            await changed.wait()
+    
+    async def serve(self, host : str, port : int) -> None:
+        server = await asyncio.start_server(self.handle, host, port)
+        pump = asyncio.create_task(self.pump())
+        
+        try:
+            async with server: await server.serve_forever()
+        finally:
+            self.events.put(None)
+            await pump
+            
+            for pool in self.pools.values(): pool.shutdown(cancel_futures=True)
+            self.manager.shutdown()
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    
+    parser.add_argument('--host', type=str, help='Host address of the service.', default='127.0.0.1')
+    parser.add_argument('--port', type=int, help='Port of the service.', default=8000)
+    parser.add_argument('--root', type=str, help='Root directory of the jobs artifacts.', default='jobs')
+    parser.add_argument('--extract_workers', type=int, help='Number of extraction worker processes.', default=None)
+    parser.add_argument('--render_workers',  type=int, help='Number of rendering worker processes.', default=None)
+    
+    args = parser.parse_args()
+    
+    service = Service(
+        args.root,
+        extract_workers=args.extract_workers,
+        render_workers=args.render_workers,
+    )
+    
+    try: asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt: pass
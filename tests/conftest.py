@@ -0,0 +1,37 @@
+import os
+import sys
+import json
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+@pytest.fixture(scope='session')
+def fixture(tmp_path_factory):
+    '''Factory of the synthetic tutorials: returns the parsed arguments of
+    the named fixture of the regression harness, or of a custom script (as
+    in `FIXTURES`) with the given name, drawn on first use.
+    '''
+    import parse
+    from bench.regression import COLORS, FIXTURES, FIXTURES_DIR, make_fixture
+    from parser.utils import get_layout
+    
+    # Custom scripts only live as long as the test session
+    custom = tmp_path_factory.mktemp('fixtures')
+    
+    def make(name, *options, script=None):
+        root   = FIXTURES_DIR if script is None else str(custom)
+        script = FIXTURES[name] if script is None else script
+        video  = os.path.join(root, f'{name}.avi')
+        
+        note_color = {hand : COLORS[hand][0] for hand in script}
+        args = parse.parse_args(['full', video, '--note_color', json.dumps(note_color), *options])
+        
+        if not os.path.exists(video):
+            os.makedirs(root, exist_ok=True)
+            make_fixture(video, script, get_layout(parse.get_configs(args)))
+        
+        return args
+    
+    return make
@@ -0,0 +1,28 @@
+import os
+
+import pytest
+
+import parse
+from parser.events import to_events
+
+def test_resume_matches_and_checkpoint_stays_small(fixture, tmp_path):
+    path = str(tmp_path / 'run.ckpt')
+    
+    expected, _ = parse.extract(fixture('chords'))
+    
+    sizes = []
+    def interrupt(n, total):
+        if os.path.exists(path): sizes.append(os.path.getsize(path))
+        if n >= 180: raise KeyboardInterrupt
+    
+    args = fixture('chords', '--checkpoint', path, '--checkpoint_every', '30')
+    with pytest.raises(KeyboardInterrupt): parse.extract(args, progress=interrupt)
+    
+    # Checkpoints hold the timing of the changes, not their frames
+    assert max(sizes) < 64 * 1024
+    
+    args = fixture('chords', '--checkpoint', path, '--resume')
+    music, info = parse.extract(args)
+    
+    assert to_events(music) == to_events(expected)
+    assert list(music) == list(expected)
@@ -0,0 +1,51 @@
+import os
+import json
+
+import pytest
+
+import parse
+from parser.checkpoint import Checkpoint
+from parser.events import to_events
+
+# A passage repeated four times, the last repeat with an extra short note
+PHRASE = ['C-4', 'E-4', 'G-4', 'E-4', 'D-4', 'F-4', 'A-4', 'F-4']
+
+def script(length):
+    return {
+        'left'  : [(['C-3'], 4. * k, 4.) for k in range(4)],
+        'right' : [([note], 4. * k + .5 * i, .5) for k in range(4) for i, note in enumerate(PHRASE)] + [(['C-6'], 13.1, length)],
+    }
+
+def rounded(events):
+    return json.loads(json.dumps(events), parse_float=lambda x: round(float(x), 6))
+
+@pytest.fixture(scope='module')
+def repeats(fixture):
+    def make(length, *options):
+        return fixture(f'repeats-{length}', *options, script=script(length))
+    
+    return make
+
+# NOTE: A 0.1s note only lasts 3 frames of the last repeat
+@pytest.mark.parametrize('length', [.25, .1])
+@pytest.mark.parametrize('window', ['30', '45', '60'])
+def test_dedup_keeps_short_variations_of_repeats(repeats, window, length):
+    expected, _ = parse.extract(repeats(length))
+    music, _ = parse.extract(repeats(length, '--dedup_window', window))
+    
+    assert any(note.name == 'C-6' for chord in music['right'] for note in chord)
+    
+    # NOTE: Elapsed times of the reused frames are shifted, up to float rounding
+    assert rounded(to_events(music)) == rounded(to_events(expected))
+
+def test_dedup_keeps_checkpointing(repeats, tmp_path):
+    path = str(tmp_path / 'run.ckpt')
+    
+    saved = [0]
+    def record(n, total):
+        if os.path.exists(path) and (k := Checkpoint.load(path).num_frames) != saved[-1]: saved.append(k)
+    
+    parse.extract(repeats(.25, '--dedup_window', '30', '--checkpoint', path, '--checkpoint_every', '7'), progress=record)
+    
+    # Reused frames skip ahead by up to a window, never past a checkpoint
+    assert all(b - a < 7 + 30 for a, b in zip(saved, saved[1:]))
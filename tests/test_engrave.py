@@ -0,0 +1,123 @@
+import os
+import sys
+import stat
+import subprocess
+
+import pytest
+
+import parse
+from parser.engrave import engrave, engrave_sections, section_bounds, split_sections
+
+# Stand-in for lilypond: fails unless both the source & the output prefix
+# resolve from its working directory, as the real executable does, and (still
+# writing a PDF) on sources marked as broken. Every engraved source is logged
+# next to the executable
+STUB = f'''#!{sys.executable}
+import os
+import sys
+
+# NOTE: abjad reads the version for the header of the sources
+if sys.argv[1:] == ['--version']: sys.exit(print('GNU LilyPond 2.24.0'))
+
+*_, prefix, source = sys.argv
+with open(source) as f: text = f.read()
+with open(prefix + '.pdf', 'w') as f: f.write('%PDF')
+with open(os.path.join(os.path.dirname(__file__), 'log'), 'a') as f: f.write(source + '\\n')
+if '% broken' in text: sys.exit(1)
+'''
+
+@pytest.fixture
+def engraved(tmp_path, monkeypatch):
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+    
+    stub = bin_dir / 'lilypond'
+    stub.write_text(STUB)
+    stub.chmod(stub.stat().st_mode | stat.S_IEXEC)
+    
+    monkeypatch.setenv('PATH', f'{bin_dir}{os.pathsep}{os.environ["PATH"]}')
+    
+    def sources():
+        log = bin_dir / 'log'
+        return log.read_text().splitlines() if log.exists() else []
+    
+    return sources
+
+def test_engrave_relative_out_dir(engraved, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    
+    os.makedirs(os.path.join('out', 'score-sections'))
+    source = os.path.join('out', 'score-sections', 'section.ly')
+    with open(source, 'w') as f: f.write('{ c }')
+    
+    path = engrave(source)
+    
+    assert os.path.exists(path)
+    assert os.path.samefile(path, os.path.join('out', 'score-sections', 'section.pdf'))
+
+def test_sections_are_cached(engraved, tmp_path):
+    from abjad import Score, Staff
+    
+    def sections(*notes):
+        return [Score([Staff(note)], name=f'Section {idx}') for idx, note in enumerate(notes)]
+    
+    def preamble(idx, n):
+        return f'% Section {idx} of {n}'
+    
+    out_dir = str(tmp_path / 'out')
+    first = engrave_sections(sections("c'1", "d'1", "e'1"), preamble, out_dir, 'score')
+    assert len(engraved()) == 3
+    
+    # Only the sections whose source changed are engraved again
+    again = engrave_sections(sections("c'1", "f'1", "e'1"), preamble, out_dir, 'score')
+    assert len(engraved()) == 4
+    assert again[0] == first[0] and again[2] == first[2] and again[1] != first[1]
+    assert all(os.path.exists(path) for path in again)
+    
+    # The entries of the sections gone are dropped from the cache
+    cache = os.path.join(out_dir, 'score-sections', 'cache')
+    assert sorted(os.listdir(cache)) == sorted(os.path.basename(path)[:-4] + ext for path in again for ext in ('.ly', '.pdf'))
+
+def test_failed_sections_are_not_cached(engraved, tmp_path):
+    from abjad import Score, Staff
+    
+    def preamble(idx, n):
+        return '% broken' if broken else ''
+    
+    out_dir = str(tmp_path / 'out')
+    sections = [Score([Staff("c'1")], name='Section 0')]
+    
+    # LilyPond failing may still write a PDF, which is never cached
+    broken = True
+    with pytest.raises(subprocess.CalledProcessError): engrave_sections(sections, preamble, out_dir, 'score')
+    assert not any(name.endswith('.pdf') for name in os.listdir(os.path.join(out_dir, 'score-sections', 'cache')))
+    
+    broken = False
+    paths = engrave_sections(sections, preamble, out_dir, 'score')
+    assert len(engraved()) == 2 and os.path.exists(paths[0])
+
+def test_sections_do_not_cut_ties(fixture):
+    from abjad import Tie, get, select
+    
+    # The second note crosses the first bar line, which the rewrite ties across
+    script = {'right' : [(['E-4'], 0., 3.), (['G-4'], 3., 2.), (['C-4'], 5., 3.), (['E-4'], 8., 4.)]}
+    args = fixture('ties', '--rewrite', 'right', '--section_bars', '1', script=script)
+    
+    music, _ = parse.extract(args)
+    staves, preamble, _ = parse.compose(music, args)
+    
+    # Pages are only numbered when the score is engraved at once
+    assert 'print-page-number = ##f' in preamble(1, 2) and 'print-page-number' not in preamble()
+    
+    bounds   = section_bounds(staves, parse.get_configs(args), section_bars=args.section_bars)
+    sections = split_sections(staves, bounds)
+    
+    # No section ends on a tie, nor starts with the continuation of one
+    assert len(bounds) > 1
+    for (start, _), section in zip(bounds, sections):
+        leaf = next(leaf for leaf in select.leaves(staves['right']) if get.timespan(leaf).start_offset == start)
+        assert get.logical_tie(leaf).head is leaf
+        assert get.indicator(select.leaves(section)[-1], Tie) is None
+    
+    # The notes are all kept
+    assert sum(len(select.leaves(section)) for section in sections) == len(select.leaves(staves['right']))
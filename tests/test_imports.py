@@ -0,0 +1,16 @@
+import os
+import pkgutil
+import subprocess
+import sys
+
+import parser
+
+def test_lazy_names_do_not_shadow_submodules():
+    submodules = {info.name for info in pkgutil.iter_modules(parser.__path__)}
+    assert not submodules & set(parser._LAZY)
+
+def test_lazy_export_after_submodule_import():
+    # A fresh interpreter, as the import order is what matters
+    code = 'import parser.sweep; from parser import make_grid, run_sweep; assert callable(run_sweep)'
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, '-c', code], cwd=root, check=True)
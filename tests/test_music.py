@@ -0,0 +1,79 @@
+import pytest
+
+from parser.music import RawChord, align_hands, fix_invalid
+from parser.utils import Configs
+
+# Sixteenths of 250 ms, i.e. 5, 9 or 11 of them are invalid durations
+CONFIGS = Configs(MIN_UNIT=16)
+
+def chords():
+    return [
+        RawChord(['C-4'], CONFIGS, time=1250),        # Invalid, merged with the next two
+        RawChord(['C-4', 'E-4'], CONFIGS, time=1000),
+        RawChord(['C-4'], CONFIGS, time=750),
+        RawChord(['G-4'], CONFIGS, time=50),          # Empty
+        RawChord(['A-4'], CONFIGS, time=2250),        # Invalid, split in two
+        RawChord(['B-4'], CONFIGS, time=500),
+        RawChord(['D-4'], CONFIGS, time=40),          # Empty, trailing
+    ]
+
+def sixteenths(out):
+    return [sorted((note.name, int(note.duration * 16)) for note in chord) for chord in out]
+
+@pytest.mark.parametrize('switches, expected, expected_stats', [
+    (
+        {},
+        [[('C-4', 12)], [('A-4', 8)], [('A-4', 1)], [('B-4', 2)]],
+        {'merged' : 3, 'dropped' : 2, 'split' : 1},
+    ),
+    (
+        {'merge_invalid' : False},
+        [[('C-4', 4)], [('C-4', 1)], [('C-4', 4), ('E-4', 4)], [('C-4', 3)], [('A-4', 8)], [('A-4', 1)], [('B-4', 2)]],
+        {'merged' : 0, 'dropped' : 2, 'split' : 2},
+    ),
+    (
+        # Empty chords are kept & never split
+        {'remove_empty' : False},
+        [[('C-4', 12)], [('G-4', 0)], [('A-4', 8)], [('A-4', 1)], [('B-4', 2)], [('D-4', 0)]],
+        {'merged' : 3, 'dropped' : 0, 'split' : 1},
+    ),
+    (
+        {'split_invalid' : False},
+        [[('C-4', 12)], [('A-4', 9)], [('B-4', 2)]],
+        {'merged' : 3, 'dropped' : 2, 'split' : 0},
+    ),
+    (
+        {'remove_empty' : False, 'merge_invalid' : False, 'split_invalid' : False},
+        [[('C-4', 5)], [('C-4', 4), ('E-4', 4)], [('C-4', 3)], [('G-4', 0)], [('A-4', 9)], [('B-4', 2)], [('D-4', 0)]],
+        {'merged' : 0, 'dropped' : 0, 'split' : 0},
+    ),
+])
+def test_fix_invalid(switches, expected, expected_stats):
+    stats = {}
+    out = fix_invalid(chords(), stats=stats, **switches)
+    
+    # The trailing chords are kept, unless empty
+    assert sixteenths(out) == expected
+    assert stats == expected_stats
+
+def test_align_hands_pads_every_track():
+    # At 30 fps the tolerance of two frames is ~66.7 ms
+    info = {
+        'video_fps'    : 30,
+        'notes_onset'  : {'left' : 0.,     'right' : 60.,   'pedal' : 70.},
+        'notes_offset' : {'left' : 10000., 'right' : 9900., 'pedal' : 9940.},
+    }
+    chords = {hand : [RawChord(['C-4'], CONFIGS, time=1000)] for hand in info['notes_onset']}
+    first  = {hand : track[0] for hand, track in chords.items()}
+    
+    aligned = align_hands(chords, info, CONFIGS)
+    
+    def rest(chord):
+        return [note.name for note in chord] == ['R'] and round(chord.time, 6)
+    
+    # Just inside the tolerance nothing is padded, just outside a rest is
+    # prepended (late onset) or appended (early offset) to the track
+    assert aligned['left'] == [first['left']]
+    assert aligned['right'][0] is first['right'] and len(aligned['right']) == 2 and rest(aligned['right'][1]) == 100.
+    assert aligned['pedal'][1] is first['pedal'] and len(aligned['pedal']) == 2 and rest(aligned['pedal'][0]) == 70.
+    assert list(aligned) == ['left', 'right', 'pedal']
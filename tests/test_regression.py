@@ -0,0 +1,13 @@
+import pytest
+
+from bench.regression import FIXTURES, XFAIL, run
+
+@pytest.mark.parametrize('name', [
+    pytest.param(name, marks=pytest.mark.xfail(reason=XFAIL[name], strict=True)) if name in XFAIL else name
+    for name in FIXTURES
+])
+def test_golden_transcriptions(name):
+    res = run(name)
+    
+    assert res['precision'] == res['recall'] == 1.
+    assert res['ly_identical']
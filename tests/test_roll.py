@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+import parse
+from parser.events import to_events
+from parser.utils import get_layout
+
+@pytest.mark.parametrize('name', ['chords', 'accidentals', 'trio'])
+def test_roll_matches_direct_extraction(fixture, name, tmp_path):
+    prefix = str(tmp_path / name)
+    
+    direct, _ = parse.extract(fixture(name, '--dump_roll', prefix))
+    replay, _ = parse.extract(fixture(name, '--from_roll', prefix))
+    
+    # Hands (i.e. staves) come in the same order, with the same chords
+    assert list(replay) == list(direct)
+    assert to_events(replay) == to_events(direct)
+
+def test_roll_splits_where_the_boxes_move(tmp_path):
+    path, prefix = str(tmp_path / 'moving.rgb'), str(tmp_path / 'moving')
+    
+    def args(*options):
+        return parse.parse_args(['extract', *options, '--frame_size', '320', '250', '--fps', '30', '--note_color', '{"right": "g"}'])
+    
+    # The bar of a held note drops lower on the key (i.e. its box moves while
+    # the key stays the same), then the note is released
+    layout = get_layout(parse.get_configs(args(path)))
+    (white_kb, _), (white_sp, _) = layout.keys, layout.dims
+    x = white_sp[white_kb.index('C-4')] * 320
+    
+    frames = np.zeros((40, 250, 320, 3), dtype=np.uint8)
+    frames[  :15,  0:, int(x - 2) : int(x + 3)] = (0, 255, 0)
+    frames[15:30, 40:, int(x - 2) : int(x + 3)] = (0, 255, 0)
+    frames.tofile(path)
+    
+    direct, _ = parse.extract(args(path, '--dump_roll', prefix))
+    replay, _ = parse.extract(args('--from_roll', prefix))
+    
+    assert [[note.name for note in chord] for chord in direct['right']] == [['C-4'], ['C-4'], ['R']]
+    assert to_events(replay) == to_events(direct)
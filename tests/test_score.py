@@ -0,0 +1,25 @@
+from copy import deepcopy
+
+import pytest
+
+import parse
+from bench.regression import XFAIL
+
+@pytest.mark.parametrize('name', [
+    pytest.param(name, marks=pytest.mark.xfail(reason=XFAIL[name], strict=True)) if name in XFAIL else name
+    for name in ('chords', 'accidentals', 'trio')
+])
+def test_rewrite_independent_of_chunk_bars(fixture, name):
+    from abjad import lilypond
+    
+    args = fixture(name)
+    music, _ = parse.extract(args)
+    hands = list(args.note_color)
+    
+    scores = []
+    for chunk_bars in ('1', '3', '1000'):
+        args = fixture(name, '--rewrite', *hands, '--chunk_bars', chunk_bars, '--workers', '2')
+        _, _, file = parse.compose(deepcopy(music), args)
+        scores.append(lilypond(file.items[-1]))
+    
+    assert scores[0] == scores[1] == scores[2]
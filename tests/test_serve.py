@@ -0,0 +1,77 @@
+import os
+import queue
+import asyncio
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import parse
+import serve
+from serve import Job, Service
+
+@pytest.fixture
+def service(tmp_path):
+    service = Service(str(tmp_path), extract_workers=1, render_workers=1)
+    yield service
+    
+    for pool in service.pools.values(): pool.shutdown(cancel_futures=True)
+    service.manager.shutdown()
+
+def test_broken_pool_is_replaced(service):
+    async def main():
+        pool = service.pools['extract']
+        
+        # A worker dying abruptly only fails the job it was running
+        with pytest.raises(BrokenProcessPool): await service.execute('extract', os._exit, 1)
+        assert service.pools['extract'] is not pool
+        
+        return await service.execute('extract', abs, -1)
+    
+    assert asyncio.run(main()) == 1
+
+def test_jobs_are_kept_until_done(service, tmp_path):
+    async def main():
+        job = service.submit({'path' : str(tmp_path / 'missing.mp4')})
+        assert len(service.tasks) == 1
+        
+        while not job.finished: await job.changed.wait()
+        await asyncio.sleep(0)
+        
+        return job
+    
+    job = asyncio.run(main())
+    
+    assert job.status == 'failed' and 'missing.mp4' in job.error
+    assert not service.tasks
+
+class Writer:
+    def __init__(self):
+        self.data = b''
+    
+    def write(self, data):
+        self.data += data
+    
+    async def drain(self):
+        pass
+
+def test_only_files_are_artifacts(service, tmp_path, monkeypatch):
+    # A rendered job, with the section cache next to the score
+    args = parse.parse_args(['full', 'video.mp4', '--out_dir', str(tmp_path / 'job')])
+    os.makedirs(tmp_path / 'job' / 'score-sections')
+    (tmp_path / 'job' / 'score.pdf').write_bytes(b'%PDF')
+    
+    monkeypatch.setattr(parse, 'render', lambda music, args: None)
+    artifacts = serve._render('job', {}, args, queue.SimpleQueue())
+    assert artifacts == ['score.pdf']
+    
+    async def get(name, listed):
+        job = service.jobs['job'] = Job('job', args, status='done', artifacts=listed)
+        writer = Writer()
+        await service.route('GET', f'/jobs/{job.id}/artifacts/{name}', b'', writer)
+        return writer.data.split(b'\r\n')[0]
+    
+    assert asyncio.run(get('score.pdf', artifacts)) == b'HTTP/1.1 200 OK'
+    
+    # Directories are never served, even if listed
+    assert asyncio.run(get('score-sections', artifacts)) == b'HTTP/1.1 404 Not Found'
+    assert asyncio.run(get('score-sections', ['score-sections'])) == b'HTTP/1.1 404 Not Found'
@@ -0,0 +1,132 @@
+import os
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+import parse
+import parser.video
+from parser.events import to_events
+from parser.source import SIDECAR, ImageSequence, RawFrames, Source, VideoSource, open_source
+from parser.utils import get_layout
+
+class Counting(RawFrames):
+    closed = 0
+    
+    def close(self) -> None:
+        self.closed += 1
+        super().close()
+
+@pytest.fixture
+def blank(tmp_path):
+    # Frames with no notes at all
+    path = tmp_path / 'blank.rgb'
+    np.zeros((8, 250, 320, 3), dtype=np.uint8).tofile(path)
+    return str(path)
+
+def extract(path, **kwargs):
+    args = parse.parse_args(['extract', 'video.mp4'])
+    return parser.video.extract_notes(
+        path,
+        get_layout(parse.get_configs(args)),
+        note_color=args.note_color,
+        verbose=False,
+        **kwargs,
+    )
+
+def test_source_is_abstract():
+    with pytest.raises(TypeError): Source()
+    
+    class Partial(Source):
+        def read(self): return False, None, 0.
+    
+    with pytest.raises(TypeError): Partial()
+
+def test_caller_owned_source_is_not_closed(blank, fixture):
+    args = fixture('scale')
+    
+    class CountingVideo(VideoSource):
+        closed = 0
+        def close(self) -> None: self.closed += 1
+    
+    source = CountingVideo(args.path)
+    extract(source, early_stop=30)
+    assert source.closed == 0 and source.read()[0]
+    source.capture.release()
+    
+    source = Counting([blank], (320, 250), fps=30)
+    
+    with pytest.raises(ValueError, match='No notes'): extract(source)
+    assert source.closed == 0
+    
+    with pytest.raises(ValueError, match='tracking'): extract(source, tracking=True, dedup_window=30)
+    assert source.closed == 0
+
+def test_owned_source_is_closed_on_errors(blank, monkeypatch):
+    opened = []
+    def counting(path, **kwargs):
+        opened.append(Counting([path], (320, 250), fps=30))
+        return opened[-1]
+    
+    monkeypatch.setattr(parser.video, 'open_source', counting)
+    
+    with pytest.raises(ValueError, match='No notes'): extract(blank)
+    assert [source.closed for source in opened] == [1]
+    
+    # Arguments are checked before any source is opened
+    with pytest.raises(ValueError, match='checkpoint'): extract(blank, resume=True)
+    assert len(opened) == 1
+
+@pytest.fixture(scope='module')
+def frames(fixture, tmp_path_factory):
+    # Frames of a fixture dumped as PNGs with unpadded names, and their timestamps
+    args = fixture('chords')
+    root = tmp_path_factory.mktemp('frames')
+    
+    times = []
+    with VideoSource(args.path) as source:
+        while (item := source.read())[0]:
+            _, image, elapsed = item
+            cv2.imwrite(str(root / f'f{len(times)}.png'), image)
+            times.append(elapsed)
+    
+    return root, times
+
+def test_image_directory_matches_video(fixture, frames, tmp_path):
+    root, times = frames
+    expected, _ = parse.extract(fixture('chords'))
+    
+    # Frames are timed by the sidecar inside the directory...
+    np.savetxt(root / SIDECAR, times)
+    args = fixture('chords', '--decode_workers', '4')
+    args.path = str(root)
+    
+    music, _ = parse.extract(args)
+    assert to_events(music) == to_events(expected)
+    os.remove(root / SIDECAR)
+    
+    # ...or by the declared frame rate
+    with pytest.raises(ValueError, match='fps'): open_source(str(root))
+    with open_source(str(root), fps=1e3 / (times[1] - times[0])) as source:
+        assert np.allclose(source.times, times)
+
+def test_image_sequence_prefetch(frames):
+    root, times = frames
+    files = [str(root / f'f{idx}.png') for idx in range(len(times))]
+    
+    with ImageSequence(files, fps=30, workers=2, prefetch=4) as source:
+        assert [source.read()[2] for _ in range(3)] == pytest.approx([0., 1e3 / 30, 2e3 / 30])
+        
+        # Frames prefetched before a seek are dropped
+        source.seek(20)
+        ret, image, elapsed = source.read()
+        assert ret and source.position == 21 and elapsed == pytest.approx(20e3 / 30)
+        assert np.array_equal(image, cv2.imread(files[20]))
+
+def test_image_sequence_fails_before_decoding(tmp_path):
+    (tmp_path / 'f0.png').write_bytes(b'not an image')
+    
+    threads = threading.active_count()
+    with pytest.raises(ValueError, match='decode'): ImageSequence([str(tmp_path / 'f0.png')], fps=30)
+    assert threading.active_count() == threads
@@ -0,0 +1,53 @@
+from parser.music import RawChord
+from parser.sweep import SWITCHES, evaluate, make_grid, run_sweep, timing_error
+from parser.utils import Configs
+
+CONFIGS = Configs(MIN_UNIT=16)
+
+def music():
+    # Detected chords drifting from a 60 BPM grid, one of them empty
+    return {
+        'right' : [
+            RawChord(['C-4'], CONFIGS, time=1250, elapsed=1000),
+            RawChord(['C-4', 'E-4'], CONFIGS, time=1000, elapsed=2250),
+            RawChord(['C-4'], CONFIGS, time=750, elapsed=3250),
+            RawChord(['G-4'], CONFIGS, time=50, elapsed=4000),
+            RawChord(['A-4'], CONFIGS, time=2250, elapsed=4050),
+            RawChord(['B-4'], CONFIGS, time=500, elapsed=6300),
+        ],
+    }
+
+def test_timing_error():
+    chords = [
+        RawChord(['C-4'], CONFIGS, time=1000, elapsed=1000),
+        RawChord(['E-4'], CONFIGS, time=1000, elapsed=2000),
+        RawChord(['G-4'], CONFIGS, time=1000, elapsed=3100),
+        RawChord(['G-4'], CONFIGS, time=1000, elapsed=3100), # Split chords share their elapsed time
+    ]
+    
+    assert timing_error(chords, CONFIGS) == 100.
+
+def test_make_grid():
+    grid = make_grid(CONFIGS, bpm=[60, 90], min_unit=[8, 16])
+    
+    # The switches are swept over all their combinations, unless given
+    assert len(grid) == 2 * 2 * 2 ** len(SWITCHES)
+    assert {(configs.BPM, configs.BPM_UNIT, configs.MIN_UNIT) for configs, _ in grid} == {(b, 4, m) for b in (60, 90) for m in (8, 16)}
+    
+    switches = dict.fromkeys(SWITCHES, True)
+    assert make_grid(CONFIGS, switches=switches) == [(CONFIGS, switches)]
+
+def test_sweep_ranking():
+    grid = make_grid(CONFIGS, bpm=[60, 75])
+    results = run_sweep(music(), grid, workers=2)
+    
+    # Each setting is scored as when evaluated on its own
+    assert sorted(map(str, results)) == sorted(str(evaluate(music(), setting)) for setting in grid)
+    
+    # Fewest invalid notes first, then fewest fixes, then the smallest timing error
+    assert all(result.rank == (result.invalid, result.merged + result.split + result.dropped, result.error) for result in results)
+    assert [result.rank for result in results] == sorted(result.rank for result in results)
+    
+    # Fewer fixes beat a smaller timing error, fewer invalid notes beat fewer fixes
+    assert [result.rank for result in results[:5]] == [(0, 3, 100.), (0, 4, 250.), (0, 4, 250.), (0, 5, 0.), (1, 2, 100.)]
+    assert results[0].configs.BPM == 60 and not results[0].switches['merge_invalid']
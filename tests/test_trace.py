@@ -0,0 +1,45 @@
+import gzip
+import json
+import threading
+
+import pytest
+
+import parse
+from parser.trace import Tracer
+from parser.utils import get_layout
+from parser.video import extract_notes
+
+@pytest.mark.parametrize('ext', ['.json', '.json.gz'])
+def test_trace_of_the_extraction(fixture, tmp_path, ext):
+    args = fixture('chords')
+    path = str(tmp_path / f'trace{ext}')
+    
+    extract_notes(args.path, get_layout(parse.get_configs(args)), note_color=args.note_color, trace=path, verbose=False)
+    
+    # The writer thread is done once the extraction returns
+    assert not any(thread.name == 'trace-writer' for thread in threading.enumerate())
+    
+    with (gzip.open if path.endswith('.gz') else open)(path, 'rt') as f: events = json.load(f)
+    
+    threads = {event['tid'] : event['args']['name'] for event in events if event['ph'] == 'M'}
+    spans = [event for event in events if event['ph'] == 'X']
+    
+    # Decode & detection latency of every frame, boxes of every hand
+    assert {'decode', 'detect'} <= {event['name'] for event in spans}
+    assert all(event['dur'] >= 0 for event in spans)
+    
+    boxes = [event for event in events if event['ph'] == 'C']
+    assert boxes and all(event['name'] == 'boxes' and set(event['args']) == set(args.note_color) for event in boxes)
+    
+    # Chord changes are instants on the row of their hand
+    changes = [event for event in events if event['ph'] == 'i']
+    assert {threads[event['tid']] for event in changes} == set(args.note_color)
+    assert all(event['name'] == 'change' and 'elapsed' in event['args'] for event in changes)
+
+def test_tracer_close_stops_the_writer(tmp_path):
+    tracer = Tracer(str(tmp_path / 'trace.json'))
+    tracer.instant('change', 0.)
+    tracer.close()
+    
+    assert not tracer.writer.is_alive()
+    assert [event['name'] for event in json.loads((tmp_path / 'trace.json').read_text())] == ['thread_name', 'change']
@@ -0,0 +1,45 @@
+from copy import deepcopy
+
+import pytest
+
+import parse
+from parser.events import to_events
+
+# A held note under a moving line of the same hand
+SCRIPT = {
+    'right' : [(['C-4'], 0., 4.), (['E-4'], 0., 1.), (['G-4'], 1., 1.5), (['E-4'], 2.5, 1.5)],
+}
+
+@pytest.fixture(scope='module')
+def held(fixture):
+    def make(*options):
+        return fixture('held', '--tracking', *options, script=SCRIPT)
+    
+    return make
+
+def test_held_notes_are_tied(held):
+    from abjad import lilypond
+    
+    music, _ = parse.extract(held())
+    
+    # The held note is tied through every chord change but the last one
+    pieces = [note for chord in to_events(music)['right'] for note in chord['notes'] if note['name'] == 'C-4']
+    assert len(pieces) > 1
+    assert [note['start_tie'] for note in pieces] == [True] * (len(pieces) - 1) + [False]
+    assert [note['sustained'] for note in pieces] == [False] + [True] * (len(pieces) - 1)
+    
+    for options in ([], ['--rewrite', 'right']):
+        _, _, file = parse.compose(deepcopy(music), held(*options))
+        lines = [line.strip() for line in lilypond(file.items[-1]).splitlines()]
+        
+        # Some note always carries on, so every chord is tied to the next one
+        leaves = [idx for idx, line in enumerate(lines) if line.startswith('<') and line != '<<']
+        assert all(lines[idx + 1] == '~' for idx in leaves[:-1])
+        
+        # Chords only partially tied are never fused into one
+        assert "<c' g'>" in lines[leaves[1]]
+
+def test_tracked_notes_are_not_dumped_to_a_roll(held, tmp_path):
+    # The roll cannot replay the tracked chords, which are dated back
+    with pytest.raises(ValueError, match='piano roll'): parse.extract(held('--dump_roll', str(tmp_path / 'roll')))
+    assert not list(tmp_path.iterdir())
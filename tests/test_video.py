@@ -0,0 +1,13 @@
+import pytest
+
+import parse
+from parser.events import to_events
+
+# NOTE: Black key bars are the narrowest ones, under 2px wide at a scale of .1
+@pytest.mark.parametrize('scale', ['.5', '.1'])
+@pytest.mark.parametrize('name', ['chords', 'accidentals'])
+def test_downscaled_detection_matches(fixture, name, scale):
+    expected, _ = parse.extract(fixture(name))
+    music, _ = parse.extract(fixture(name, '--detect_scale', scale))
+    
+    assert to_events(music) == to_events(expected)